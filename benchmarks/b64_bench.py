@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Microbenchmarks for the dict index base64 codec over dictd/*.index.
+
+Compares the original list.index() based decoder and concatenating
+encoder with the table-driven b64_decode()/b64_encode() and the batch
+b64_decode_index(), and times a whole index load each way.
+
+Usage: python3 benchmarks/b64_bench.py [dictd directory]"""
+
+import glob
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dictdlib  # noqa: E402
+
+REPEAT = 5
+
+
+def old_b64_encode(val):
+    startfound = 0
+    retval = ""
+    for i in range(5, -1, -1):
+        thispart = (val >> (6 * i)) & ((2 ** 6) - 1)
+        if (not startfound) and (not thispart):
+            continue
+        startfound = 1
+        retval += dictdlib.b64_list[thispart]
+    if len(retval):
+        return retval
+    else:
+        return dictdlib.b64_list[0]
+
+
+def old_b64_decode(str):
+    if not len(str):
+        return 0
+    retval = 0
+    shiftval = 0
+    for i in range(len(str) - 1, -1, -1):
+        val = dictdlib.b64_list.index(str[i])
+        retval = retval | (val << shiftval)
+        shiftval += 6
+    return retval
+
+
+def old_load(data):
+    indexentries = {}
+    for line in data.splitlines():
+        splits = line.rstrip().split("\t")
+        if splits[0] not in indexentries:
+            indexentries[splits[0]] = []
+        indexentries[splits[0]].append([old_b64_decode(splits[1]),
+                                        old_b64_decode(splits[2])])
+    return indexentries
+
+
+def new_load(data):
+    indexentries = {}
+    words, starts, sizes = dictdlib.b64_decode_index(data)
+    for word, start, size in zip(words, starts, sizes):
+        if word not in indexentries:
+            indexentries[word] = []
+        indexentries[word].append([start, size])
+    return indexentries
+
+
+def best(func, *args):
+    return min(timeit.repeat(lambda: func(*args), number=1,
+                             repeat=REPEAT)) * 1000
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'dictd'
+    print('%-12s %7s | %9s %9s %9s | %9s %9s | %9s %9s' %
+          ('index', 'lines', 'dec old', 'dec tbl', 'dec batch',
+           'enc old', 'enc new', 'load old', 'load new'))
+    for indexfilename in sorted(glob.glob(os.path.join(directory,
+                                                       '*.index'))):
+        with open(indexfilename, encoding='utf-8') as indexfile:
+            data = indexfile.read()
+        rows = [line.split('\t') for line in data.splitlines()]
+        column = [row[1] for row in rows] + [row[2] for row in rows]
+        values = [dictdlib.b64_decode(x) for x in column]
+        print('%-12s %7d | %9.2f %9.2f %9.2f | %9.2f %9.2f | %9.2f %9.2f' %
+              (os.path.basename(indexfilename)[:-len('.index')], len(rows),
+               best(lambda: [old_b64_decode(x) for x in column]),
+               best(lambda: [dictdlib.b64_decode(x) for x in column]),
+               best(dictdlib.b64_decode_array, column),
+               best(lambda: [old_b64_encode(x) for x in values]),
+               best(lambda: [dictdlib.b64_encode(x) for x in values]),
+               best(old_load, data),
+               best(new_load, data)))
+    print('All times in ms, best of %d.' % REPEAT)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Load test dictserver.py on localhost.
+
+Starts the server in a process of its own, unless --port is given, and
+opens --connections connections to it, each sending DEFINE and MATCH
+(prefix) commands, half and half, for random headwords of the
+database, one after the other, for --duration seconds.  Reports the
+commands per second and the latency percentiles.
+
+Usage: python3 benchmarks/dict_load.py [-c 200] [-t 10] [-b eng-spa]
+                                       [--port 2628]"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dictdlib  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DICTD = os.path.join(ROOT, 'dictd')
+# The status codes ending a response.
+_FINAL = (b'250', b'552', b'550', b'551', b'500', b'501', b'420')
+
+
+async def response(reader):
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError('connection closed')
+        if line[:3] in _FINAL:
+            return line[:3]
+
+
+async def client(port, database, words, seed, deadline, latencies, errors):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    await reader.readline()
+    while time.perf_counter() < deadline:
+        word = rng.choice(words).replace('"', '')
+        if rng.random() < 0.5:
+            command = 'DEFINE %s "%s"\r\n' % (database, word)
+        else:
+            command = 'MATCH %s prefix "%s"\r\n' % (database, word[:3])
+        start = time.perf_counter()
+        writer.write(command.encode('utf-8'))
+        status = await response(reader)
+        latencies.append(time.perf_counter() - start)
+        if status not in (b'250', b'552'):
+            errors.append(status)
+    writer.write(b'QUIT\r\n')
+    writer.close()
+
+
+async def wait_for_server(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def run(args, port):
+    await wait_for_server(port)
+    words = dictdlib.DictDB(os.path.join(DICTD, args.database),
+                            quiet=1).getdeflist()
+    # Warm up, so opening the database and building its indexes is not
+    # measured.
+    await client(port, args.database, words, 0, time.perf_counter() + 1,
+                 [], [])
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+    await asyncio.gather(*[client(port, args.database, words, seed,
+                                  deadline, latencies, errors)
+                           for seed in range(1, args.connections + 1)])
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-c', '--connections', type=int, default=200)
+    parser.add_argument('-t', '--duration', type=float, default=10)
+    parser.add_argument('-b', '--database', default='eng-spa')
+    parser.add_argument('--port', type=int,
+                        help='server to test (default: start one)')
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+    if port is None:
+        port = free_port()
+        server = subprocess.Popen([sys.executable,
+                                   os.path.join(ROOT, 'dictserver.py'),
+                                   '--port', str(port)])
+    try:
+        elapsed, latencies, errors = asyncio.run(run(args, port))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1,
+                             int(len(latencies) * fraction))] * 1000
+
+    print('%s, %d connections, %.1f s' % (args.database, args.connections,
+                                          elapsed))
+    print('commands %d  errors %d  %.0f commands/s' %
+          (len(latencies), len(errors), len(latencies) / elapsed))
+    if latencies:
+        print('latency p50 %.2f ms  p99 %.2f ms  p99.9 %.2f ms  '
+              'max %.2f ms' % (percentile(0.5), percentile(0.99),
+                               percentile(0.999), latencies[-1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
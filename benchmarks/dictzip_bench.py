@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Compare getdef() latency against definition offset for the shipped
+.dict.dz files, reading them through gzip.GzipFile (the old path) and
+through dictdlib.DictzipFile.
+
+Usage: python3 benchmarks/dictzip_bench.py [dictd directory]"""
+
+import glob
+import gzip
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dictdlib  # noqa: E402
+
+REPEAT = 5
+SAMPLES = 5
+
+
+def read_index(indexfilename):
+    entries = []
+    with open(indexfilename, encoding='utf-8') as indexfile:
+        for line in indexfile:
+            splits = line.rstrip('\n').split('\t')
+            entries.append((dictdlib.b64_decode(splits[1]),
+                            dictdlib.b64_decode(splits[2])))
+    entries.sort()
+    return entries
+
+
+def time_lookup(dictfile, start, size, cold):
+    best = None
+    for i in range(REPEAT):
+        if cold:
+            if isinstance(dictfile, dictdlib.DictzipFile):
+                dictfile._cache.clear()
+            else:
+                # GzipFile rewinds to the start of the stream on a
+                # backwards seek, which is what most lookups hit.
+                dictfile.seek(0)
+        t = time.perf_counter()
+        dictfile.seek(start)
+        dictfile.read(size)
+        elapsed = time.perf_counter() - t
+        if best is None or elapsed < best:
+            best = elapsed
+    return best * 1000
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'dictd'
+    print('%-16s %10s %12s %12s %12s' %
+          ('dictionary', 'offset', 'gzip ms', 'dictzip ms', 'cached ms'))
+    for dictfilename in sorted(glob.glob(os.path.join(directory,
+                                                      '*.dict.dz'))):
+        basename = dictfilename[:-len('.dict.dz')]
+        entries = read_index(basename + '.index')
+        old = gzip.GzipFile(dictfilename, 'r')
+        new = dictdlib.DictzipFile(dictfilename)
+        for i in range(SAMPLES):
+            start, size = entries[(len(entries) - 1) * i // (SAMPLES - 1)]
+            print('%-16s %10d %12.3f %12.3f %12.3f' %
+                  (os.path.basename(basename), start,
+                   time_lookup(old, start, size, True),
+                   time_lookup(new, start, size, True),
+                   time_lookup(new, start, size, False)))
+        old.close()
+        new.close()
+
+
+if __name__ == '__main__':
+    main()
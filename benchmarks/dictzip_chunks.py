@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Compare dictzip chunk sizes on the contents of the shipped .dict.dz
+files: each one is inflated and compressed again by
+dictdlib.write_dictzip() with every chunk size, and the compressed size,
+the compression time and the latency of cold getdef() reads (random
+headwords, chunk cache cleared) are reported, the latter as the median
+and the 99th percentile.
+
+Usage: python3 benchmarks/dictzip_chunks.py [-j processes] [-n reads]
+                                            [dictd directory]"""
+
+import argparse
+import glob
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dictdlib  # noqa: E402
+
+CHUNKLENS = (2048, 4096, 8192, 16384, 32768, dictdlib.DICTZIP_CHUNKLEN)
+
+
+def read_index(indexfilename):
+    entries = []
+    with open(indexfilename, encoding='utf-8') as indexfile:
+        for line in indexfile:
+            splits = line.rstrip('\n').split('\t')
+            entries.append((dictdlib.b64_decode(splits[1]),
+                            dictdlib.b64_decode(splits[2])))
+    return entries
+
+
+def time_reads(filename, entries):
+    dictfile = dictdlib.DictzipFile(filename)
+    latencies = []
+    for start, size in entries:
+        dictfile._cache.clear()
+        t = time.perf_counter()
+        dictfile.seek(start)
+        dictfile.read(size)
+        latencies.append(time.perf_counter() - t)
+    dictfile.close()
+    latencies.sort()
+    return (latencies[len(latencies) // 2] * 1000,
+            latencies[min(len(latencies) - 1,
+                          int(len(latencies) * 0.99))] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('directory', nargs='?', default=os.path.join(
+        os.path.dirname(__file__), '..', 'dictd'))
+    parser.add_argument('-j', '--processes', type=int,
+                        help='compressing processes (default: one per CPU)')
+    parser.add_argument('-n', '--reads', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    totals = dict((chunklen, [0, 0.0]) for chunklen in CHUNKLENS)
+    plainsize = 0
+    temp = tempfile.mkdtemp()
+    print('%-10s %8s %10s %7s %9s %9s %9s' %
+          ('dictionary', 'chunk', 'bytes', 'ratio', 'write s',
+           'p50 ms', 'p99 ms'))
+    try:
+        for dictfilename in sorted(glob.glob(os.path.join(args.directory,
+                                                          '*.dict.dz'))):
+            basename = dictfilename[:-len('.dict.dz')]
+            name = os.path.basename(basename)
+            entries = read_index(basename + '.index')
+            entries = [rng.choice(entries) for i in range(args.reads)]
+            plain = os.path.join(temp, name + '.dict')
+            compressed = dictdlib.open_dictfile(dictfilename)
+            with open(plain, 'wb') as output:
+                shutil.copyfileobj(compressed, output)
+            compressed.close()
+            size = os.path.getsize(plain)
+            plainsize += size
+            for chunklen in CHUNKLENS:
+                filename = os.path.join(temp, name + '.dict.dz')
+                t = time.perf_counter()
+                dictdlib.write_dictzip(plain, filename, chunklen,
+                                       processes=args.processes)
+                elapsed = time.perf_counter() - t
+                p50, p99 = time_reads(filename, entries)
+                compressedsize = os.path.getsize(filename)
+                totals[chunklen][0] += compressedsize
+                totals[chunklen][1] += elapsed
+                print('%-10s %8d %10d %7.3f %9.3f %9.3f %9.3f' %
+                      (name, chunklen, compressedsize,
+                       compressedsize / max(size, 1), elapsed, p50, p99))
+            os.remove(plain)
+    finally:
+        shutil.rmtree(temp)
+
+    print()
+    print('%-10s %8s %10s %7s %9s' % ('total', 'chunk', 'bytes', 'ratio',
+                                      'write s'))
+    for chunklen in CHUNKLENS:
+        compressedsize, elapsed = totals[chunklen]
+        print('%-10s %8d %10d %7.3f %9.3f' %
+              ('', chunklen, compressedsize,
+               compressedsize / max(plainsize, 1), elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Load test wordsserver.py on localhost.
+
+Starts a server in this process, unless --url is given, and runs
+--clients threads that each keep one connection alive and send
+/define and /suggest requests (half and half) for random headwords of
+the pair, for --duration seconds.  Reports the requests per second and
+the latency percentiles.  Keep --clients at most the number of server
+threads: a kept-alive connection holds on to its thread.
+
+Usage: python3 benchmarks/http_load.py [-p eng-spa] [-c 4] [-t 10]
+                                       [--url http://host:port]"""
+
+import argparse
+import http.client
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import quote
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dictdlib  # noqa: E402
+import wordsserver  # noqa: E402
+
+DICTD = os.path.join(os.path.dirname(__file__), '..', 'dictd')
+
+
+def client(host, port, pair, words, seed, deadline, latencies, errors):
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(host, port)
+    while time.perf_counter() < deadline:
+        word = rng.choice(words)
+        if rng.random() < 0.5:
+            path = '/define?pair=%s&word=%s' % (pair, quote(word))
+        else:
+            path = '/suggest?pair=%s&word=%s' % (pair, quote(word[:3]))
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as error:
+            errors.append(error)
+            connection.close()
+            connection = http.client.HTTPConnection(host, port)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-p', '--pair', default='eng-spa')
+    parser.add_argument('-c', '--clients', type=int, default=4)
+    parser.add_argument('-t', '--duration', type=float, default=10)
+    parser.add_argument('--url', help='server to test (default: start one)')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        server = wordsserver.LookupServer(
+            ('127.0.0.1', 0),
+            wordsserver.SharedDictionaries(DICTD, max_handles=4),
+            args.clients)
+        host, port = server.server_address[:2]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    words = dictdlib.DictDB(os.path.join(DICTD, args.pair),
+                            quiet=1).getdeflist()
+    # Warm up, so opening the dictionary and building its indexes is
+    # not measured.
+    client(host, port, args.pair, words, 0, time.perf_counter() + 0.5,
+           [], [])
+
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=client,
+                                args=(host, port, args.pair, words, seed,
+                                      deadline, latencies, errors))
+               for seed in range(1, args.clients + 1)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    latencies.sort()
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1,
+                             int(len(latencies) * fraction))] * 1000
+
+    print('%s, %d clients, %.1f s' % (args.pair, args.clients, elapsed))
+    print('requests %d  errors %d  %.0f requests/s' %
+          (len(latencies), len(errors), len(latencies) / elapsed))
+    if latencies:
+        print('latency p50 %.2f ms  p90 %.2f ms  p99 %.2f ms  max %.2f ms' %
+              (percentile(0.5), percentile(0.9), percentile(0.99),
+               latencies[-1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
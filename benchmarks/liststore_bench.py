@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Measure how long it takes to show suggestions in a TreeView like the
+one of the activity, realized in an offscreen window:
+
+  attached  clear() the model of the treeview and append() every row,
+            as _show_suggestions() used to
+  swapped   fill a new ListStore and set_model() it
+  page      the same, with only the first page of suggestions
+
+The time includes the layout pass that follows.
+
+Usage: python3 benchmarks/liststore_bench.py [rows] [repeats]"""
+
+import sys
+import time
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk  # noqa: E402
+
+PAGE = 100
+
+
+def make_treeview():
+    treeview = Gtk.TreeView(Gtk.ListStore(str))
+    treeview.set_headers_visible(False)
+    treeview.append_column(
+        Gtk.TreeViewColumn('', Gtk.CellRendererText(), text=0))
+    scroll = Gtk.ScrolledWindow()
+    scroll.set_size_request(300, 600)
+    scroll.add(treeview)
+    window = Gtk.OffscreenWindow()
+    window.add(scroll)
+    window.show_all()
+    settle()
+    return treeview
+
+
+def settle():
+    while Gtk.events_pending():
+        Gtk.main_iteration_do(False)
+
+
+def attached(treeview, rows):
+    model = treeview.get_model()
+    model.clear()
+    for row in rows:
+        model.append([row])
+
+
+def swapped(treeview, rows):
+    model = Gtk.ListStore(str)
+    for row in rows:
+        model.append([row])
+    treeview.set_model(model)
+
+
+def page(treeview, rows):
+    swapped(treeview, rows[:PAGE])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rows = ['suggestion%05d' % i for i in range(count)]
+    treeview = make_treeview()
+    print('%d rows, best of %d' % (count, repeats))
+    for fill in (attached, swapped, page):
+        best = None
+        for i in range(repeats):
+            # Start from a full model, as when the query changes.
+            swapped(treeview, rows)
+            settle()
+            start = time.perf_counter()
+            fill(treeview, rows)
+            settle()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print('%-10s %9.1f ms' % (fill.__name__, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Measure how long the main loop is blocked per keystroke by the
+dictionary lookups of WordsActivity._translate(), headless.
+
+"sync" runs the lookups inline, as _translate() used to; "engine" goes
+through LookupEngine, with a queue standing in for GLib.idle_add, and
+counts only the time the main thread spends submitting jobs and running
+the delivered callbacks.  Widget updates are not included either way.
+
+Usage: python3 benchmarks/mainloop_stall.py [from] [to] [words...]"""
+
+import os
+import queue
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dictdmodel  # noqa: E402
+from lookupengine import LookupEngine  # noqa: E402
+
+DICTD = os.path.join(os.path.dirname(__file__), '..', 'dictd')
+LIMIT = 100
+
+
+def keystrokes(words):
+    for word in words:
+        for i in range(1, len(word) + 1):
+            yield word[:i]
+
+
+def run_sync(dictionary, texts):
+    stalls = []
+    for text in texts:
+        t = time.perf_counter()
+        dictionary.get_definition(text)
+        dictionary.get_suggestions(text, LIMIT)
+        stalls.append(time.perf_counter() - t)
+    return stalls
+
+
+def run_engine(dictionary, texts):
+    mainloop = queue.Queue()
+    engine = LookupEngine(lambda function, *args:
+                          mainloop.put((function, args)))
+    delivered = []
+    stalls = []
+    for text in texts:
+        t = time.perf_counter()
+        engine.submit('translation', delivered.append,
+                      dictionary.get_definition, text)
+        engine.submit('suggestions', delivered.append,
+                      dictionary.get_suggestions, text, LIMIT)
+        stalls.append(time.perf_counter() - t)
+        # The main loop gets to run between keystrokes.
+        while not mainloop.empty():
+            function, args = mainloop.get()
+            t = time.perf_counter()
+            function(*args)
+            stalls.append(time.perf_counter() - t)
+    engine.stop()
+    return stalls
+
+
+def report(name, stalls):
+    stalls = sorted(stalls)
+    print('%-7s total %8.2f ms  max %7.3f ms  p95 %7.3f ms' %
+          (name, sum(stalls) * 1000, stalls[-1] * 1000,
+           stalls[int(len(stalls) * 0.95)] * 1000))
+
+
+def main():
+    from_lang = sys.argv[1] if len(sys.argv) > 1 else 'eng'
+    to_lang = sys.argv[2] if len(sys.argv) > 2 else 'deu'
+    words = sys.argv[3:] or ['house', 'beautiful', 'ingredient',
+                             'water', 'elephant']
+    dictionary = dictdmodel.Dictionary(DICTD, from_lang, to_lang)
+    texts = list(keystrokes(words))
+    # Build the suggestion indexes first, so neither run pays for it.
+    dictionary.get_suggestions('warm', LIMIT)
+    dictionary.get_corrections('warm')
+    print('%s-%s, %d keystrokes' % (from_lang, to_lang, len(texts)))
+    report('sync', run_sync(dictionary, texts))
+    report('engine', run_engine(dictionary, texts))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Compare the original .index.db layout (one unindexed row per headword,
+inserted one execute() at a time) with the current SQLIndex schema.
+
+For every dictionary in the directory, both files are built in a
+temporary directory from the text index; the script reports build time
+and the latency of the queries getdef() and hasdef() issue against
+each, and of a substring search, which get_suggestions() used to run on
+the legacy file.  The matches column counts the headwords it returns:
+the legacy "word like ?" on a blob column matches nothing at all on
+current SQLite releases.
+
+Usage: python3 benchmarks/sql_bench.py [dictd directory]"""
+
+import glob
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dictdlib  # noqa: E402
+
+WORDS = 200
+QUERIES = ['a', 'ho', 'hou', 'ing', 'tion']
+
+
+def build_legacy(filename, indexentries):
+    conn = sqlite3.connect(filename)
+    conn.execute('CREATE TABLE definitions ' +
+                 '(word TEXT, position INTEGER, size INTEGER)')
+    conn.commit()
+    for word in list(indexentries.keys()):
+        values = indexentries[word][0]
+        conn.execute('insert into definitions values ' +
+                     '(?, ?, ?)', (memoryview(word.encode()), values[0],
+                                   values[1]))
+    conn.commit()
+    return conn
+
+
+def per_call(func, args):
+    t = time.perf_counter()
+    for arg in args:
+        func(arg)
+    return (time.perf_counter() - t) / len(args) * 1000
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'dictd'
+    random.seed(0)
+    print('%-10s %-7s %9s %10s %10s %10s %8s' %
+          ('dictionary', 'schema', 'build ms', 'getdef ms', 'miss ms',
+           'suggest ms', 'matches'))
+    tmpdir = tempfile.mkdtemp()
+    for indexfilename in sorted(glob.glob(os.path.join(directory,
+                                                       '*.index'))):
+        name = os.path.basename(indexfilename)[:-len('.index')]
+        with open(indexfilename, encoding='utf-8') as indexfile:
+            indexentries = dictdlib.loadindex(indexfile.read())
+        words = random.sample(list(indexentries),
+                              min(WORDS, len(indexentries)))
+        misses = [word + 'qx' for word in words]
+
+        legacyname = os.path.join(tmpdir, name + '.legacy.db')
+        t = time.perf_counter()
+        conn = build_legacy(legacyname, indexentries)
+        build = (time.perf_counter() - t) * 1000
+
+        def legacy_getdef(word):
+            return conn.execute('select * from definitions where word=? ',
+                                (memoryview(word.encode()), )).fetchall()
+
+        def legacy_suggest(word):
+            return conn.execute('select word from definitions where '
+                                'word like ?', (memoryview(
+                                    '%{}%'.format(word).encode()), )
+                                ).fetchall()
+
+        print('%-10s %-7s %9.1f %10.4f %10.4f %10.3f %8d' %
+              (name, 'legacy', build, per_call(legacy_getdef, words),
+               per_call(legacy_getdef, misses),
+               per_call(legacy_suggest, QUERIES),
+               sum(len(legacy_suggest(query)) for query in QUERIES)))
+        conn.close()
+
+        newname = os.path.join(tmpdir, name + '.index.db')
+        t = time.perf_counter()
+        dictdlib.SQLIndex.write(newname, indexentries, indexfilename)
+        build = (time.perf_counter() - t) * 1000
+        index = dictdlib.SQLIndex(newname, indexfilename)
+        conn = sqlite3.connect(newname)
+
+        def suggest(word):
+            return conn.execute('select distinct word from definitions '
+                                'where instr(word, ?) > 0', (word, )
+                                ).fetchall()
+
+        print('%-10s %-7s %9.1f %10.4f %10.4f %10.3f %8d' %
+              (name, 'v%d' % dictdlib.SQLIndex.VERSION, build,
+               per_call(index.lookup, words), per_call(index.lookup, misses),
+               per_call(suggest, QUERIES),
+               sum(len(suggest(query)) for query in QUERIES)))
+        conn.close()
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Benchmark dictdlib over the shipped dictionaries, headless.
+
+Every dictionary in dictd/, and the GCIDE index in dictd-en/, is
+measured with each index in a process of its own, on links to its files
+in a temporary directory, so the indexes built along the way are not
+left in the tree and each process starts from the same state.  The
+indexes are:
+
+  text       the whole text index parsed into a dict (with no
+             .index.db nor .index.bin around; the parse also compiles
+             the .index.bin, which is removed before each open)
+  lazy       TextIndex, bisecting the text index; left out for the
+             indexes that are not sorted, where DictDB falls back to
+             parsing them
+  db         the shipped .index.db, if any
+  bin        the .index.bin, compiled beforehand by another process
+
+For each dictionary:
+
+  open       for each index, the time to open a DictDB, the class that
+             ended up serving its lookups (dict for a parsed index) and
+             the peak resident set size of its process, once the
+             getdef() latencies below are measured
+  getdef     latency of getdef() hits and misses with each index, with
+             the definition cache disabled
+  build      time to build the trigram and spelling indexes (in the bin
+             process, after its peak RSS is taken)
+  suggest    latency of get_suggestions(query, 100) by query length
+
+Times are in ms; latencies are given as median and p99.  dictd-en only
+has the index of GCIDE, so its getdef() hits read empty definitions.
+
+Usage:
+  python3 benchmarks/suite.py [-o results.json] [-n samples] [name...]
+  python3 benchmarks/suite.py --compare old.json new.json [-t 0.5]
+
+The second form prints the measurements that changed by more than the
+threshold (a fraction) between two runs, and exits with status 1 if
+any of them got worse."""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dictdlib  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DICTIONARIES = [os.path.join(ROOT, 'dictd'), os.path.join(ROOT, 'dictd-en')]
+VERSION = 2
+LIMIT = 100
+QUERY_LENGTHS = range(1, 7)
+OPEN_REPEATS = 5
+# The DictDB options selecting each index, and the class serving the
+# lookups with it (None if any will do).
+BACKENDS = [('text', {'sqlindex': 0}, None),
+            ('lazy', {'lazy': 1, 'sqlindex': 0}, 'TextIndex'),
+            ('db', {}, None),
+            ('bin', {}, None)]
+# Differences smaller than this (ms) are noise, whatever the ratio.
+MIN_DIFFERENCE = 0.05
+
+
+def find_dictionaries(names):
+    found = {}
+    for directory in DICTIONARIES:
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith('.index'):
+                name = file_name[:-len('.index')]
+                found[name] = os.path.join(directory, name)
+    if names:
+        missing = set(names) - set(found)
+        if missing:
+            sys.exit('Unknown dictionaries: %s' % ', '.join(sorted(missing)))
+        return dict((name, found[name]) for name in names)
+    return found
+
+
+def stats(samples):
+    samples = sorted(samples)
+    return {'median_ms': samples[len(samples) // 2] * 1000,
+            'p99_ms': samples[min(len(samples) - 1,
+                                  int(len(samples) * 0.99))] * 1000}
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def latencies(function, args):
+    samples = []
+    for arg in args:
+        start = time.perf_counter()
+        function(*arg)
+        samples.append(time.perf_counter() - start)
+    return stats(samples)
+
+
+def link_dictionary(source, directory):
+    """Links the files of the dictionary source into directory and
+    returns the basename of the links."""
+    basename = os.path.join(directory, os.path.basename(source))
+    os.symlink(source + '.index', basename + '.index')
+    for suffix in ('.dict.dz', '.dict', '.index.db'):
+        if os.path.exists(source + suffix):
+            os.symlink(source + suffix, basename + suffix)
+    if not os.path.exists(source + '.dict.dz') and \
+            not os.path.exists(source + '.dict'):
+        open(basename + '.dict', 'w').close()
+    return basename
+
+
+def read_headwords(source):
+    """Returns the distinct headwords of the dictionary source, in index
+    order."""
+    headwords = {}
+    with open(source + '.index', encoding='utf-8') as index:
+        for line in index:
+            headwords[line.split('\t', 1)[0]] = None
+    return list(headwords)
+
+
+def index_type(db):
+    # A parsed index lives in DictDB.indexentries.
+    return 'dict' if db._index is None else type(db._index).__name__
+
+
+def compile_binary_index(basename):
+    dictdlib.DictDB(basename, quiet=1, cache=None, sqlindex=0).close()
+
+
+def measure(source, backend, hits):
+    """Runs the measurements of one dictionary with one index; called in
+    a process of its own.  Returns None if the index does not apply."""
+    directory = tempfile.mkdtemp(prefix='words-bench-')
+    try:
+        return _measure(link_dictionary(source, directory), backend, hits)
+    finally:
+        shutil.rmtree(directory)
+
+
+def _measure(basename, backend, hits):
+    options, expected = [(options, expected)
+                         for name, options, expected in BACKENDS
+                         if name == backend][0]
+    if backend == 'db' and not os.path.exists(basename + '.index.db'):
+        return None
+    if backend == 'bin':
+        # Elsewhere, so the parse does not count in our peak RSS.
+        process = multiprocessing.Process(target=compile_binary_index,
+                                          args=(basename, ))
+        process.start()
+        process.join()
+
+    times = []
+    for i in range(OPEN_REPEATS):
+        if backend == 'text' and os.path.exists(basename + '.index.bin'):
+            os.remove(basename + '.index.bin')
+        if i:
+            db.close()
+        elapsed, db = timed(dictdlib.DictDB, basename, quiet=1, cache=None,
+                            **options)
+        times.append(elapsed)
+    misses = [word + 'qzx' for word in hits]
+    getdef = {'hit': latencies(db.getdef, [(word,) for word in hits]),
+              'miss': latencies(db.getdef, [(word,) for word in misses])}
+    # Checked after the lookups: TextIndex may find the disorder there.
+    index = index_type(db)
+    if expected is not None and index != expected:
+        db.close()
+        return None
+    result = {'open': {backend: {
+        'time_ms': min(times) * 1000, 'index': index,
+        # Kilobytes on Linux.
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}},
+        'getdef': {backend: getdef}}
+
+    if backend == 'bin':
+        result['build'] = {}
+        elapsed, index = timed(db._gettrigramindex)
+        result['build']['trigram'] = {'time_ms': elapsed * 1000}
+        elapsed, index = timed(db._getspellindex)
+        result['build']['spelling'] = {'time_ms': elapsed * 1000}
+
+        result['suggest'] = {}
+        lowered = [word.lower() for word in hits]
+        for length in QUERY_LENGTHS:
+            queries = [word[:length] for word in lowered
+                       if len(word) >= length]
+            if not queries:
+                continue
+
+            def suggest(query):
+                # Each query on its own, not narrowed from the last one.
+                db._narrowing = None
+                db.get_suggestions(query, LIMIT)
+            result['suggest'][str(length)] = latencies(
+                suggest, [(query,) for query in queries])
+    db.close()
+    return result
+
+
+def run(names, samples):
+    results = {}
+    for name, source in sorted(find_dictionaries(names).items()):
+        headwords = read_headwords(source)
+        hits = random.Random(0).sample(headwords,
+                                       min(samples, len(headwords)))
+        result = {'headwords': len(headwords), 'open': {}, 'getdef': {}}
+        for backend, options, expected in BACKENDS:
+            print('%s %s...' % (name, backend), file=sys.stderr)
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), '--child',
+                 source, '--backend', backend],
+                input=json.dumps(hits).encode())
+            measured = json.loads(output.decode())
+            if measured is None:
+                continue
+            for key, value in measured.items():
+                result.setdefault(key, {}).update(value)
+        results[name] = result
+    return {'version': VERSION,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'samples': samples,
+            'results': results}
+
+
+def flatten(value, path=()):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            for flat in flatten(item, path + (key,)):
+                yield flat
+    elif isinstance(value, (int, float)):
+        yield '.'.join(path), value
+
+
+def compare(old, new, threshold):
+    """Prints the measurements of new that differ from old by more than
+    threshold; returns the number of them that got worse.  Every
+    measurement is better lower."""
+    if old.get('version') != VERSION or new.get('version') != VERSION:
+        sys.exit('Can only compare results of version %d' % VERSION)
+    old_values = dict(flatten(old['results']))
+    regressions = 0
+    for path, value in flatten(new['results']):
+        if path not in old_values or path.endswith('headwords'):
+            continue
+        before = old_values[path]
+        if path.endswith('_ms') and abs(value - before) < MIN_DIFFERENCE:
+            continue
+        if before and abs(value - before) / before > threshold:
+            worse = value > before
+            regressions += worse
+            print('%-10s %-40s %12.3f -> %12.3f  %+6.0f%%' %
+                  ('WORSE' if worse else 'better', path, before, value,
+                   (value - before) * 100 / before))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark dictdlib over the shipped dictionaries.')
+    parser.add_argument('names', nargs='*',
+                        help='dictionaries to measure (all by default)')
+    parser.add_argument('-o', '--output', help='write the results here')
+    parser.add_argument('-n', '--samples', type=int, default=1000,
+                        help='words looked up per measurement')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two results files')
+    parser.add_argument('-t', '--threshold', type=float, default=0.5,
+                        help='relative change reported by --compare')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--backend', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # The words to look up come on stdin.
+        json.dump(measure(args.child, args.backend, json.load(sys.stdin)),
+                  sys.stdout)
+        return
+    if args.compare:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            regressions = compare(json.load(old), json.load(new),
+                                  args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    results = run(args.names, args.samples)
+    text = json.dumps(results, indent=1, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
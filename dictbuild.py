@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Build the dictionaries of the activity from FreeDict sources.
+
+A source is a FreeDict TEI file (eng-spa.tei) or a dictionary in dictd
+format (eng-spa.index, next to eng-spa.dict or eng-spa.dict.dz); the
+language pair is named after the file.  Directories given are searched
+for both.  For every pair, the output directory gets:
+
+  eng-spa.dict.dz     the definitions, dictzip compressed
+  eng-spa.index       the sorted text index
+  eng-spa.index.bin   the compiled index (BinaryIndex)
+  eng-spa.index.db    the SQLite index (SQLIndex)
+  eng-spa.index.tri   the suggestions index (TrigramIndex)
+  eng-spa.index.sym   the corrections index (SpellIndex)
+
+The pairs are built in parallel, one per worker process, each in a
+temporary directory from which its files are moved in place once they
+are all written.  The SHA-256 of the sources and of the outputs of
+every pair are recorded in build-manifest.json, in the output
+directory; a pair whose sources and outputs still hash the same is
+skipped.
+
+Usage:
+  python3 dictbuild.py -o dictd freedict/eng-ita.tei freedict/ita-eng.tei
+  python3 dictbuild.py -o dictd -j 4 dictd"""
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+import xml.etree.ElementTree as ElementTree
+
+import dictdlib
+
+MANIFEST = 'build-manifest.json'
+# Bump to rebuild every pair, when the outputs would differ.
+_BUILD_VERSION = 1
+_OUTPUTS = ('.dict.dz', '.index', '.index.bin', '.index.db', '.index.tri',
+            '.index.sym')
+_FREEDICT_URL = 'https://freedict.org/'
+
+
+def find_sources(paths):
+    """Returns {pair: (kind, [source files])}, kind being 'tei' or
+    'dictd'.  Raises ValueError if a pair has two sources."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, '*.tei')) +
+                            glob.glob(os.path.join(path, '*.index')))
+        else:
+            files.append(path)
+    sources = {}
+    for filename in files:
+        pair = os.path.basename(filename).split('.')[0]
+        if filename.endswith('.tei'):
+            source = ('tei', [filename])
+        elif filename.endswith('.index'):
+            basename = filename[:-len('.index')]
+            dictfilename = basename + '.dict.dz'
+            if not os.path.exists(dictfilename):
+                dictfilename = basename + '.dict'
+            source = ('dictd', [filename, dictfilename])
+        else:
+            raise ValueError('%s is not a .tei or .index file' % filename)
+        if pair in sources:
+            raise ValueError('%s and %s both build %s' %
+                             (sources[pair][1][0], filename, pair))
+        sources[pair] = source
+    return sources
+
+
+def source_key(files, chunklen):
+    """Returns the hash of the source files and the build parameters
+    that outputs are recorded under."""
+    digest = hashlib.sha256(('%d %d' % (_BUILD_VERSION, chunklen))
+                            .encode('utf-8'))
+    for filename in files:
+        digest.update(('\n%s %s' % (os.path.basename(filename),
+                                    dictdlib.hashfile(filename)))
+                      .encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _tag(element):
+    # Drop the TEI namespace, {http://www.tei-c.org/ns/1.0}.
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def _find(element, tag):
+    for child in element.iter():
+        if _tag(child) == tag:
+            return child
+    return None
+
+
+def _findall(element, tag):
+    return [child for child in element.iter() if _tag(child) == tag]
+
+
+def _text(element):
+    return ' '.join(''.join(element.itertext()).split())
+
+
+def _tei_header(header):
+    """Returns the database info entries of a TEI header, as
+    DictDB.setshortname(), seturl() and setlonginfo() write them."""
+    entries = []
+    title = _find(header, 'title')
+    if title is not None and _text(title):
+        entries.append((dictdlib.short_headword + '\n     ' + _text(title),
+                        [dictdlib.short_headword]))
+    url = _FREEDICT_URL
+    for ref in _findall(header, 'ref'):
+        if ref.get('target', '').startswith('http'):
+            url = ref.get('target')
+            break
+    entries.append((dictdlib.url_headword + '\n     ' + url,
+                    [dictdlib.url_headword]))
+    paragraphs = [_text(element) for element in
+                  _findall(header, 'p') + _findall(header, 'change')]
+    longinfo = '\n\n'.join(textwrap.fill(paragraph, 64,
+                                         initial_indent='   ',
+                                         subsequent_indent='   ')
+                           for paragraph in paragraphs if paragraph)
+    if longinfo:
+        entries.append((dictdlib.info_headword + '\n' + longinfo,
+                        [dictdlib.info_headword]))
+    return entries
+
+
+def _tei_entry(entry):
+    """Returns the (defstr, headwords) of a TEI entry, written as the
+    shipped dictionaries are: the headword and its pronunciation, then
+    a translation per line."""
+    headwords = []
+    for orth in _findall(entry, 'orth'):
+        if _text(orth) and _text(orth) not in headwords:
+            headwords.append(_text(orth))
+    if not headwords:
+        return None
+    pron = _find(entry, 'pron')
+    line = headwords[0]
+    if pron is not None and _text(pron):
+        line += ' [%s]' % _text(pron)
+    translations = [_text(quote) for cit in _findall(entry, 'cit')
+                    if cit.get('type') == 'trans'
+                    for quote in _findall(cit, 'quote')]
+    if not translations:
+        # TEI P4 sources, and monolingual definitions.
+        translations = [_text(element) for element in
+                        _findall(entry, 'tr') + _findall(entry, 'def')]
+    lines = [line] + ['     ' + translation for translation in translations
+                      if translation]
+    return '\n'.join(lines), headwords
+
+
+def read_tei(filename):
+    """Yields the entries of a FreeDict TEI file, the database info
+    from its header first."""
+    for event, element in ElementTree.iterparse(filename):
+        tag = _tag(element)
+        if tag == 'teiHeader':
+            for result in _tei_header(element):
+                yield result
+            element.clear()
+        elif tag == 'entry':
+            result = _tei_entry(element)
+            if result is not None:
+                yield result
+            element.clear()
+
+
+def read_dictd(indexfilename, dictfilename):
+    """Yields the entries of a dictionary in dictd format, in the order
+    of the definitions, each with all of its headwords."""
+    headwords = {}
+    with open(indexfilename, encoding='utf-8') as indexfile:
+        for line in indexfile:
+            splits = line.rstrip('\n').split('\t')
+            if len(splits) < 3:
+                continue
+            position = (dictdlib.b64_decode(splits[1]),
+                        dictdlib.b64_decode(splits[2]))
+            headwords.setdefault(position, []).append(splits[0])
+    if dictfilename.endswith('.dz'):
+        dictfile = dictdlib.open_dictfile(dictfilename)
+    else:
+        dictfile = open(dictfilename, 'rb')
+    try:
+        for (start, size), words in sorted(headwords.items()):
+            dictfile.seek(start)
+            defstr = dictfile.read(size).decode('utf-8')
+            if defstr.endswith('\n'):
+                # addentries() puts it back.
+                defstr = defstr[:-1]
+            yield defstr, words
+    finally:
+        dictfile.close()
+
+
+def build(pair, kind, files, output, chunklen, processes=1):
+    """Builds every output of pair from its source files into output.
+    Returns (pair, {output file name: sha256}, headword count)."""
+    temp = tempfile.mkdtemp(prefix='.%s.' % pair, dir=output)
+    try:
+        basename = os.path.join(temp, pair)
+        db = dictdlib.DictDB(basename, 'write', quiet=1)
+        if kind == 'tei':
+            db.addentries(read_tei(files[0]))
+        else:
+            db.addentries(read_dictd(*files))
+        db.finish()
+        dictdlib.write_dictzip(basename + '.dict', basename + '.dict.dz',
+                               chunklen, processes=processes)
+        os.remove(basename + '.dict')
+
+        # Opening the new dictionary compiles the .index.bin.
+        db = dictdlib.DictDB(basename, quiet=1, cache=None)
+        try:
+            db.create_sql_index()
+            db.create_trigram_index()
+            db.create_spell_index()
+            # db.count counts the index entries, one per headword of
+            # every definition.
+            count = len(db.getdeflist())
+        finally:
+            db.close()
+
+        hashes = {}
+        for extension in _OUTPUTS:
+            hashes[pair + extension] = dictdlib.hashfile(basename +
+                                                         extension)
+        # The derived indexes are checked against the size and mtime of
+        # the text index, which os.replace() keeps, so whatever the
+        # order they are never used with another text index than theirs.
+        for extension in _OUTPUTS:
+            os.replace(basename + extension,
+                       os.path.join(output, pair + extension))
+        return pair, hashes, count
+    finally:
+        shutil.rmtree(temp, ignore_errors=True)
+
+
+def _build(task):
+    try:
+        return build(*task)
+    except Exception:
+        logging.exception('Building %s failed', task[0])
+        return task[0], None, 0
+
+
+def load_manifest(output):
+    try:
+        with open(os.path.join(output, MANIFEST)) as manifest:
+            data = json.load(manifest)
+        if data.get('version') == _BUILD_VERSION:
+            return data['pairs']
+    except (IOError, OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def save_manifest(output, pairs):
+    filename = os.path.join(output, MANIFEST)
+    with open(filename + '.tmp', 'w') as manifest:
+        json.dump({'version': _BUILD_VERSION, 'pairs': pairs}, manifest,
+                  indent=1, sort_keys=True)
+    os.replace(filename + '.tmp', filename)
+
+
+def up_to_date(entry, key, output):
+    """Returns true if the manifest entry of a pair was built from key
+    and its outputs are still what was built."""
+    if entry is None or entry.get('source') != key:
+        return False
+    for name, digest in entry['outputs'].items():
+        try:
+            if dictdlib.hashfile(os.path.join(output, name)) != digest:
+                return False
+        except (IOError, OSError):
+            return False
+    return True
+
+
+def run(sources, output, jobs, chunklen, force=False):
+    """Builds the pairs of sources, as find_sources() returns them, that
+    are out of date.  Returns the pairs that failed."""
+    manifest = load_manifest(output)
+    tasks = []
+    keys = {}
+    for pair, (kind, files) in sorted(sources.items()):
+        keys[pair] = source_key(files, chunklen)
+        if not force and up_to_date(manifest.get(pair), keys[pair], output):
+            logging.info('%s is up to date', pair)
+            continue
+        tasks.append((pair, kind, files, output, chunklen))
+
+    if len(tasks) <= 1 or jobs == 1:
+        # A single pair uses the processes to compress its chunks.
+        results = (_build(task + (jobs,)) for task in tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(min(jobs, len(tasks)))
+        results = pool.imap_unordered(_build, tasks)
+    failed = []
+    try:
+        for pair, hashes, count in results:
+            if hashes is None:
+                failed.append(pair)
+                continue
+            files = sources[pair][1]
+            if any(os.path.dirname(os.path.abspath(filename)) ==
+                   os.path.abspath(output) for filename in files):
+                # Built in place: the outputs are the sources now.
+                keys[pair] = source_key(
+                    [os.path.join(output, os.path.basename(filename))
+                     for filename in files], chunklen)
+            manifest[pair] = {'source': keys[pair], 'outputs': hashes}
+            save_manifest(output, manifest)
+            logging.info('Built %s, %d headwords', pair, count)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build dictionaries and their indexes from FreeDict '
+        'sources.')
+    parser.add_argument('sources', nargs='+',
+                        help='.tei or .index files, or directories')
+    parser.add_argument('-o', '--output', default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'dictd'),
+        help='dictionary directory')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--chunklen', type=int,
+                        default=dictdlib.DICTZIP_CHUNKLEN,
+                        help='dictzip chunk size')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='rebuild the pairs that are up to date too')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    try:
+        sources = find_sources(args.sources)
+    except ValueError as error:
+        parser.error(str(error))
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    failed = run(sources, args.output, max(1, args.jobs), args.chunklen,
+                 args.force)
+    if failed:
+        logging.error('Failed: %s', ', '.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
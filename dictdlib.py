@@ -18,48 +18,173 @@
 
 import sys
 import string
+import tempfile
+import binascii
+import itertools
 import gzip
+import hashlib
+import heapq
+import mmap
+import multiprocessing
 import os
+import re
+import shutil
 import sqlite3
+import threading
+import urllib.request
+import struct
+import zlib
+from array import array
+from collections import OrderedDict
+from collections import deque
+
+import lookupstats
 
 b64_list = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+b64_values = dict((char, i) for i, char in enumerate(b64_list))
 url_headword = "00-database-url"
 short_headword = "00-database-short"
 info_headword = "00-database-info"
 
 
+def _filename(self, *args):
+    # lookupstats key of the methods of the classes with a filename.
+    return lookupstats.name_of(self.filename)
+
+
+def _basename(self, *args):
+    # lookupstats key of the methods of DictDB.
+    return lookupstats.name_of(self.basename)
+
+
+def indexsource(indexfilename):
+    """Returns the (size, mtime) of a text index, which the indexes
+    derived from it record to tell whether they are still up to date."""
+    st = os.stat(indexfilename)
+    return st.st_size, st.st_mtime_ns
+
+
+def hashfile(filename):
+    """Returns the SHA-256 of the contents of filename, in hex."""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _tempname(filename):
+    """Creates an empty file next to filename, to be written and then
+    renamed over it, and returns its name.  Every writer gets its own,
+    so concurrent ones do not clobber each other's output."""
+    fd, tmpfilename = tempfile.mkstemp(
+        prefix=os.path.basename(filename) + ".", suffix=".tmp",
+        dir=os.path.dirname(filename) or ".")
+    os.close(fd)
+    # mkstemp() makes it private; it is as public as the dictionary.
+    os.chmod(tmpfilename, 0o644)
+    return tmpfilename
+
+
 def b64_encode(val):
     """Takes as input an integer val and returns a string of it encoded
     with the base64 algorithm used by dict indexes."""
-    startfound = 0
-    retval = ""
-    for i in range(5, -1, -1):
-        thispart = (val >> (6 * i)) & ((2 ** 6) - 1)
-        if (not startfound) and (not thispart):
-            # Both zero -- keep going.
-            continue
-        startfound = 1
-        retval += b64_list[thispart]
-    if len(retval):
-        return retval
-    else:
+    if not val:
         return b64_list[0]
+    digits = []
+    while val:
+        digits.append(b64_list[val & 0x3f])
+        val >>= 6
+    digits.reverse()
+    return "".join(digits)
 
 
 def b64_decode(str):
     """Takes as input a string and returns an integer value of it decoded
     with the base64 algorithm used by dict indexes."""
-    if not len(str):
-        return 0
     retval = 0
-    shiftval = 0
-    for i in range(len(str) - 1, -1, -1):
-        val = b64_list.index(str[i])
-        retval = retval | (val << shiftval)
-        shiftval += 6
+    try:
+        for char in str:
+            retval = (retval << 6) | b64_values[char]
+    except KeyError:
+        raise ValueError("invalid base64 digit in %r" % str)
     return retval
 
 
+def b64_decode_array(strings, typecode="Q"):
+    """Decodes a list of dict base64 strings, such as the offset or size
+    column of an index, into an array of the given typecode.
+
+    The dict alphabet is the standard base64 one, so values of up to
+    eight digits are left-padded with zeros ("A") and decoded all at
+    once by binascii, six big-endian bytes each; the bytes are then
+    spread into eight-byte slots with strided slice assignment.  Longer
+    or malformed values fall back to b64_decode()."""
+    strings = list(strings)
+    padded = "".join([x.rjust(8, "A") for x in strings])
+    raw = b""
+    if len(padded) == 8 * len(strings):
+        try:
+            raw = binascii.a2b_base64(padded)
+        except binascii.Error:
+            pass
+    # a2b_base64() skips characters outside the alphabet, so anything
+    # malformed shows up as a short result.
+    if len(raw) != 6 * len(strings):
+        return array(typecode, [b64_decode(x.strip()) for x in strings])
+    wide = bytearray(8 * len(strings))
+    for i in range(6):
+        wide[i + 2::8] = raw[i::6]
+    values = array("Q")
+    values.frombytes(bytes(wide))
+    if sys.byteorder == "little":
+        values.byteswap()
+    if typecode != "Q":
+        values = array(typecode, values)
+    return values
+
+
+# Lines parsed between two calls to the progress callback of loadindex().
+_LOADBLOCK = 20000
+
+
+def loadindex(data, progress=None):
+    """Parses the text of a dict index into a dict mapping each headword
+    to a list of [start, size] pairs, as DictDB.indexentries.  If
+    progress is given, it is called now and then with the fraction of
+    the index parsed so far."""
+    indexentries = {}
+    lines = data.splitlines()
+    for first in range(0, len(lines), _LOADBLOCK):
+        words, starts, sizes = b64_decode_lines(
+            lines[first:first + _LOADBLOCK])
+        for word, start, size in zip(words, starts, sizes):
+            if word not in indexentries:
+                indexentries[word] = []
+            indexentries[word].append([start, size])
+        if progress is not None:
+            progress(min(first + _LOADBLOCK, len(lines)) / len(lines))
+    return indexentries
+
+
+def b64_decode_index(data):
+    """Decodes the whole text of a dict index in one pass.  Returns a
+    list of headwords and two arrays, the starts and the sizes of their
+    definitions, in file order."""
+    return b64_decode_lines(data.splitlines())
+
+
+def b64_decode_lines(lines):
+    """Like b64_decode_index(), for a list of index lines."""
+    if not lines:
+        return [], array("Q"), array("Q")
+    columns = list(zip(*[line.split("\t") for line in lines]))
+    if len(columns) < 3:
+        raise ValueError("index lines need a headword, start and size")
+    return (list(columns[0]), b64_decode_array(columns[1]),
+            b64_decode_array(columns[2]))
+
+
 validdict = {}
 for x in string.ascii_letters + string.digits + " \t":
     validdict[x] = 1
@@ -75,8 +200,26 @@ def sortnormalize(x):
     return x2.upper() + "\0" + x.upper()
 
 
+_sortdiscard = re.compile("[^%s]+" % re.escape("".join(validdict)))
+
+
+def sortprimary(x):
+    """Returns the first half of sortnormalize(x): only letters, digits
+    and blanks, folded to upper case.  Sorted index files are ordered by
+    this value, so it is what a binary search over them compares."""
+    return _sortdiscard.sub("", x).upper()
+
+
+def sortkey(line):
+    """Returns the key sorting index lines as sort -df does: by their
+    letters, digits and blanks regardless of case, then, for lines equal
+    that way, by all of their characters."""
+    return (sortprimary(line), line)
+
+
 def sortfunc(x, y):
-    """Emulate sort -df."""
+    """Emulate sort -df, comparing two sortnormalize() values.  (Sort
+    with key=sortkey instead.)"""
     def cmp(a, b):
         return (a > b) - (a < b)
     xl = x.split("\0")
@@ -87,36 +230,1298 @@ def sortfunc(x, y):
     return cmp(xl[1], yl[1])
 
 
+class DictzipFile:
+
+    """Random-access reader for dictzip (.dict.dz) files.
+
+    dictzip compresses the dictionary in independent chunks and stores
+    the compressed size of every chunk in the "RA" subfield of the gzip
+    header.  That lets us seek straight to the chunk holding an offset
+    instead of inflating the stream from its start, as GzipFile does.
+
+    Decompressed chunks are kept in a small LRU cache, since consecutive
+    lookups tend to land in the same area of the dictionary."""
+
+    def __init__(self, filename, cachesize=8):
+        """Open filename, which must be a dictzip file.  cachesize is
+        the number of decompressed chunks kept in memory.
+
+        Raises ValueError if the file has no RA table, that is, if it
+        is a plain gzip file."""
+        self.filename = filename
+        self.cachesize = cachesize
+        self._file = open(filename, "rb")
+        try:
+            self._readheader()
+        except Exception:
+            self._file.close()
+            raise
+        self._cache = OrderedDict()
+        self._pos = 0
+
+    def _readheader(self):
+        header = self._file.read(10)
+        if len(header) < 10 or header[:3] != b"\x1f\x8b\x08":
+            raise ValueError("%s is not a gzip file" % self.filename)
+        flags = header[3]
+        if not flags & 0x04:
+            raise ValueError("%s has no dictzip header" % self.filename)
+        xlen = struct.unpack("<H", self._file.read(2))[0]
+        extra = self._file.read(xlen)
+
+        chunklist = None
+        pos = 0
+        while pos + 4 <= len(extra):
+            subid = extra[pos:pos + 2]
+            sublen = struct.unpack("<H", extra[pos + 2:pos + 4])[0]
+            if subid == b"RA":
+                data = extra[pos + 4:pos + 4 + sublen]
+                version, chunklen, chunkcount = struct.unpack("<HHH",
+                                                              data[:6])
+                if version != 1:
+                    raise ValueError("%s: unsupported dictzip version %d" %
+                                     (self.filename, version))
+                chunklist = struct.unpack("<%dH" % chunkcount,
+                                          data[6:6 + 2 * chunkcount])
+            pos += 4 + sublen
+        if chunklist is None:
+            raise ValueError("%s has no dictzip header" % self.filename)
+
+        if flags & 0x08:                # FNAME
+            while self._file.read(1) not in (b"\0", b""):
+                pass
+        if flags & 0x10:                # FCOMMENT
+            while self._file.read(1) not in (b"\0", b""):
+                pass
+        if flags & 0x02:                # FHCRC
+            self._file.read(2)
+
+        self.chunklen = chunklen
+        self._offsets = []
+        offset = self._file.tell()
+        for size in chunklist:
+            self._offsets.append(offset)
+            offset += size
+        self._offsets.append(offset)
+
+        # The uncompressed size is the last four bytes of the file.
+        self._file.seek(-4, 2)
+        self.size = struct.unpack("<I", self._file.read(4))[0]
+
+    def _getchunk(self, index):
+        chunk = self._cache.get(index)
+        if chunk is not None:
+            self._cache.move_to_end(index)
+            return chunk
+        chunk = self._cache[index] = self._inflate(index)
+        if len(self._cache) > self.cachesize:
+            self._cache.popitem(last=False)
+        return chunk
+
+    @lookupstats.traced('dictzip inflate', _filename)
+    def _inflate(self, index):
+        start = self._offsets[index]
+        self._file.seek(start)
+        data = self._file.read(self._offsets[index + 1] - start)
+        return zlib.decompressobj(-zlib.MAX_WBITS).decompress(data)
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self.size
+        self._pos = offset
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def read(self, size=-1):
+        if size < 0 or self._pos + size > self.size:
+            size = max(self.size - self._pos, 0)
+        parts = []
+        while size > 0:
+            index, skip = divmod(self._pos, self.chunklen)
+            part = self._getchunk(index)[skip:skip + size]
+            if not part:
+                break
+            parts.append(part)
+            self._pos += len(part)
+            size -= len(part)
+        return b"".join(parts)
+
+    def close(self):
+        self._cache.clear()
+        self._file.close()
+
+
+def open_dictfile(filename):
+    """Open a .dict.dz file for reading, with random access when it
+    carries a dictzip header, or as a plain gzip stream otherwise."""
+    try:
+        return DictzipFile(filename)
+    except ValueError:
+        return gzip.GzipFile(filename, "r")
+
+
+# The uncompressed size of the chunks dictzip writes.  Incompressible
+# data deflates to a bit more than its size, and the RA table has 16
+# bits per compressed chunk size.
+DICTZIP_CHUNKLEN = 58315
+# The longest gzip extra field; the RA table has to fit in it.
+_MAX_XLEN = 0xffff
+
+
+def _deflatechunk(data, level, last):
+    """Compresses one chunk as a raw deflate stream of its own, flushed
+    to a byte boundary so the next one can follow it, and ended if it
+    is the last one.  Runs in the worker processes of write_dictzip()."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(
+        zlib.Z_FINISH if last else zlib.Z_FULL_FLUSH)
+
+
+def write_dictzip(source, filename, chunklen=DICTZIP_CHUNKLEN, level=9,
+                  processes=None):
+    """Compresses the file source into the dictzip file filename, which
+    DictzipFile reads with random access, and gzip as usual.
+
+    source is cut in chunks of chunklen bytes, deflated independently
+    by processes worker processes (one per CPU by default, none if 1)
+    and written out in order, with only a few chunks in memory at a
+    time.  Smaller chunks make random reads cheaper and the file
+    bigger.  The RA table listing the compressed chunk sizes must fit
+    in the gzip header, so ValueError is raised if source has too many
+    chunks of chunklen bytes, or if a chunk deflates to more than 64
+    KiB (chunklen over DICTZIP_CHUNKLEN and incompressible data)."""
+    if not 0 < chunklen <= 0xffff:
+        raise ValueError("chunklen must be between 1 and 65535")
+    size = os.path.getsize(source)
+    chunkcount = max(1, -(-size // chunklen))
+    xlen = 10 + 2 * chunkcount
+    if xlen > _MAX_XLEN:
+        raise ValueError("%s has too many chunks of %d bytes, use chunks "
+                         "of at least %d" % (source, chunklen,
+                                             -(-size // ((_MAX_XLEN - 10) //
+                                                         2))))
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, chunkcount)
+
+    header = struct.pack("<3sBIBBH2sHHHH", b"\x1f\x8b\x08", 0x04,
+                         int(os.path.getmtime(source)) & 0xffffffff,
+                         2 if level == 9 else 0, 3, xlen, b"RA",
+                         xlen - 4, 1, chunklen, chunkcount)
+    sizes = []
+    crc = 0
+    temp = _tempname(filename)
+
+    def write(compressed):
+        if len(compressed) > 0xffff:
+            raise ValueError("chunk %d of %s deflates to %d bytes, use "
+                             "smaller chunks" % (len(sizes), source,
+                                                 len(compressed)))
+        sizes.append(len(compressed))
+        output.write(compressed)
+
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    try:
+        with open(source, "rb") as input, open(temp, "wb") as output:
+            # The chunk sizes are filled in at the end.
+            output.write(header + bytes(2 * chunkcount))
+            pending = deque()
+            for index in range(chunkcount):
+                data = input.read(chunklen)
+                crc = zlib.crc32(data, crc)
+                args = (data, level, index == chunkcount - 1)
+                if pool is None:
+                    write(_deflatechunk(*args))
+                    continue
+                pending.append(pool.apply_async(_deflatechunk, args))
+                if len(pending) >= 2 * processes:
+                    write(pending.popleft().get())
+            while pending:
+                write(pending.popleft().get())
+            output.write(struct.pack("<II", crc, size & 0xffffffff))
+            output.seek(len(header))
+            output.write(struct.pack("<%dH" % chunkcount, *sizes))
+        os.replace(temp, filename)
+    except BaseException:
+        os.remove(temp)
+        raise
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+class BinaryIndex:
+
+    """Read-only, memory-mapped compiled form of a dict index.
+
+    The file holds the headwords sorted by their UTF-8 bytes, together
+    with fixed-width arrays of key offsets, definition starts and
+    definition sizes.  Opening it only maps the file, lookups are a
+    binary search, and the pages are shared by every process that maps
+    the same file.
+
+    Layout (native byte order, recorded in the header):
+
+        magic       8 bytes, MAGIC + b"<" or b">"
+        typecode    1 byte, array typecode of the arrays below
+        padding     7 bytes
+        count       8 bytes, number of entries (N)
+        source      16 bytes, indexsource() of the text index
+        keyoffsets  N + 1 items, offsets of each headword in keys
+        starts      N items
+        sizes       N items
+        keys        the headwords, UTF-8, back to back"""
+
+    MAGIC = b"DICTIX2"
+
+    def __init__(self, filename, source=None):
+        """Maps filename.  If source is the indexsource() of the text
+        index and does not match the one recorded, ValueError is
+        raised."""
+        self.filename = filename
+        self._file = open(filename, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            self._file.close()
+            raise ValueError("%s is not a binary index" % filename)
+        try:
+            self._readheader(source)
+        except Exception:
+            self.close()
+            raise
+
+    @staticmethod
+    def _magic():
+        if sys.byteorder == "little":
+            return BinaryIndex.MAGIC + b"<"
+        return BinaryIndex.MAGIC + b">"
+
+    def _readheader(self, source):
+        if self._map[:8] != self._magic():
+            raise ValueError("%s is not a binary index" % self.filename)
+        typecode = chr(self._map[8])
+        count = struct.unpack("=Q", self._map[16:24])[0]
+        if source is not None and \
+                struct.unpack("=2Q", self._map[24:40]) != tuple(source):
+            raise ValueError("%s is out of date" % self.filename)
+        itemsize = array(typecode).itemsize
+        view = memoryview(self._map)
+        pos = 40
+        arrays = []
+        for length in (count + 1, count, count):
+            end = pos + length * itemsize
+            arrays.append(view[pos:end].cast(typecode))
+            pos = end
+        self._keyoffsets, self._starts, self._sizes = arrays
+        self._keybase = pos
+        self._count = count
+
+    @classmethod
+    def write(cls, filename, indexentries, source=(0, 0)):
+        """Compile indexentries, a dict mapping each headword to a list
+        of [start, size] pairs, into filename, recording source, the
+        indexsource() of the text index they come from."""
+        words = sorted(indexentries, key=lambda word: word.encode("utf-8"))
+        keys = []
+        keyoffsets = [0]
+        starts = []
+        sizes = []
+        offset = 0
+        for word in words:
+            key = word.encode("utf-8")
+            for start, size in indexentries[word]:
+                keys.append(key)
+                offset += len(key)
+                keyoffsets.append(offset)
+                starts.append(start)
+                sizes.append(size)
+        largest = max([offset] + starts + sizes)
+        typecode = "I" if largest < 2 ** 32 else "Q"
+
+        tmpfilename = _tempname(filename)
+        try:
+            with open(tmpfilename, "wb") as binfile:
+                binfile.write(cls._magic())
+                binfile.write(typecode.encode() + b"\0" * 7)
+                binfile.write(struct.pack("=3Q", len(starts), *source))
+                for values in (keyoffsets, starts, sizes):
+                    array(typecode, values).tofile(binfile)
+                binfile.write(b"".join(keys))
+            os.replace(tmpfilename, filename)
+        except BaseException:
+            os.remove(tmpfilename)
+            raise
+
+    def __len__(self):
+        return self._count
+
+    def _key(self, i):
+        return self._map[self._keybase + self._keyoffsets[i]:
+                         self._keybase + self._keyoffsets[i + 1]]
+
+    def _bisect(self, key):
+        """Returns the position of the first entry whose headword is
+        not less than key (given as bytes)."""
+        lo = 0
+        hi = self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, word):
+        """Returns a list of [start, size] pairs for word."""
+        key = word.encode("utf-8")
+        retval = []
+        i = self._bisect(key)
+        while i < self._count and self._key(i) == key:
+            retval.append([self._starts[i], self._sizes[i]])
+            i += 1
+        return retval
+
+    def __contains__(self, word):
+        key = word.encode("utf-8")
+        i = self._bisect(key)
+        return i < self._count and self._key(i) == key
+
+    def keys(self, prefix=""):
+        """Returns an iterator over the distinct headwords starting with
+        prefix, in order."""
+        key = prefix.encode("utf-8")
+        last = None
+        for i in range(self._bisect(key), self._count):
+            thiskey = self._key(i)
+            if not thiskey.startswith(key):
+                break
+            if thiskey != last:
+                last = thiskey
+                yield thiskey.decode("utf-8")
+
+    def close(self):
+        for view in ("_keyoffsets", "_starts", "_sizes"):
+            if hasattr(self, view):
+                getattr(self, view).release()
+        self._map.close()
+        self._file.close()
+
+
+class IndexOrderError(ValueError):
+
+    """Raised by TextIndex for a file that is not sorted its way."""
+
+
+class TextIndex:
+
+    """Lazy reader for a sorted text dict index.
+
+    Nothing is loaded up front: lookups bisect the file by byte offset,
+    resynchronizing on the next line start after every seek, and read
+    only the few lines around the match.  The file must be sorted the
+    way finish() sorts it (sort -df in the C locale), that is by
+    sortprimary() of the headword.  Some dictd indexes are sorted in
+    another locale's order instead; checking the lines the bisection
+    lands on against the next ones, as well as the first block and a few
+    places through the file when opening it, catches them:
+    IndexOrderError is raised."""
+
+    # Below this many bytes, scan lines instead of bisecting further.
+    _SCANSIZE = 4096
+    # Places of the file checked to be in order when opening it.
+    _CHECKS = 32
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, "rb")
+        self._size = os.fstat(self._file.fileno()).st_size
+        try:
+            # dictfmt puts its 00-database-* entries first whatever the
+            # order of the rest, so the first block is checked in full.
+            pos = 0
+            previous = None
+            while pos < min(self._size, self._SCANSIZE):
+                word, line, pos = self._readline(pos)
+                if previous is not None:
+                    self._checkorder(previous, word)
+                previous = word
+            for i in range(1, self._CHECKS):
+                start = self._nextline(self._size * i // self._CHECKS)
+                if start < self._size:
+                    self._checkedline(start)
+        except Exception:
+            self._file.close()
+            raise
+
+    def _readline(self, pos):
+        """Returns (headword, line, next line start) for the line
+        starting at pos."""
+        self._file.seek(pos)
+        line = self._file.readline()
+        word = line.split(b"\t", 1)[0].decode("utf-8")
+        return word, line, pos + len(line)
+
+    def _checkedline(self, pos):
+        """Returns _readline(pos), after checking that the next line
+        does not sort before it."""
+        word, line, end = self._readline(pos)
+        if end < self._size:
+            self._checkorder(word, self._readline(end)[0])
+        return word, line, end
+
+    def _checkorder(self, word, nextword):
+        if sortprimary(nextword) < sortprimary(word):
+            raise IndexOrderError("%s is not sorted: %r comes before %r" %
+                                  (self.filename, word, nextword))
+
+    def _nextline(self, pos):
+        """Returns the first line start at or after pos."""
+        if pos == 0:
+            return 0
+        self._file.seek(pos - 1)
+        return pos - 1 + len(self._file.readline())
+
+    def _bisect(self, key):
+        """Returns the offset of the first line whose headword has a
+        sortprimary() not less than key."""
+        lo = 0
+        hi = self._size
+        while hi - lo > self._SCANSIZE:
+            start = self._nextline((lo + hi) // 2)
+            if start >= hi:
+                break
+            word, line, end = self._checkedline(start)
+            if sortprimary(word) < key:
+                lo = end
+            else:
+                hi = start
+        previous = None
+        while lo < hi:
+            word, line, end = self._checkedline(lo)
+            if previous is not None:
+                self._checkorder(previous, word)
+            if sortprimary(word) >= key:
+                break
+            previous = word
+            lo = end
+        return lo
+
+    def _scan(self, key, prefix=False):
+        """Yields (headword, line) for every line whose sortprimary()
+        equals key, or starts with it if prefix is true."""
+        pos = self._bisect(key)
+        self._file.seek(pos)
+        previous = None
+        for line in self._file:
+            word = line.split(b"\t", 1)[0].decode("utf-8")
+            if previous is not None:
+                self._checkorder(previous, word)
+            primary = sortprimary(word)
+            if primary != key and not (prefix and primary.startswith(key)):
+                break
+            previous = word
+            yield word, line
+
+    def lookup(self, word):
+        """Returns a list of [start, size] pairs for word."""
+        retval = []
+        for thisword, line in list(self._scan(sortprimary(word))):
+            if thisword == word:
+                splits = line.rstrip().split(b"\t")
+                retval.append([b64_decode(splits[1].decode()),
+                               b64_decode(splits[2].decode())])
+        return retval
+
+    def __contains__(self, word):
+        for thisword, line in self._scan(sortprimary(word)):
+            if thisword == word:
+                return True
+        return False
+
+    def keys(self, prefix=""):
+        """Returns an iterator over the distinct headwords starting with
+        prefix.  Without a prefix this streams the whole file."""
+        seen = set()
+        if prefix:
+            lines = list(self._scan(sortprimary(prefix), prefix=True))
+        else:
+            self._file.seek(0)
+            lines = ((line.split(b"\t", 1)[0].decode("utf-8"), line)
+                     for line in self._file)
+        for word, line in lines:
+            if word.startswith(prefix) and word not in seen:
+                seen.add(word)
+                yield word
+
+    def close(self):
+        self._file.close()
+
+
+class SQLIndex:
+
+    """Read-only SQLite form of a dict index (the .index.db files).
+
+    Every index entry is a row, in index order, with the headword and
+    its lower-cased form; the latter is indexed, so exact and prefix
+    lookups are index searches rather than table scans.  Files written
+    before the schema was versioned (user_version 0) keep one row per
+    headword and have no index; SQLIndex refuses them with ValueError
+    so they can be rebuilt, as it does those of version 2, which do not
+    record what text index they were made from.
+
+    The source table holds the size, mtime and SHA-256 of that text
+    index.  The latter keeps a shipped file usable after a checkout or
+    a copy, which changes the mtime of the text index but not its
+    contents."""
+
+    VERSION = 3
+
+    def __init__(self, filename, indexfilename=None):
+        """Opens filename.  If indexfilename is given, ValueError is
+        raised unless the file was made from that text index as it is
+        now."""
+        self.filename = filename
+        # immutable: the file is never written while we have it open, so
+        # sqlite can skip locking and change detection entirely.
+        uri = "file:%s?mode=ro&immutable=1" % \
+            urllib.request.pathname2url(os.path.abspath(filename))
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        try:
+            version = self._conn.execute("pragma user_version").fetchone()[0]
+        except sqlite3.DatabaseError:
+            version = None
+        if version != self.VERSION:
+            self._conn.close()
+            raise ValueError("%s has schema version %s, expected %d" %
+                             (filename, version, self.VERSION))
+        if indexfilename is not None and not self._madefrom(indexfilename):
+            self._conn.close()
+            raise ValueError("%s is out of date" % filename)
+
+    def _madefrom(self, indexfilename):
+        row = self._conn.execute(
+            "select size, mtime, sha256 from source").fetchone()
+        if row is None:
+            return False
+        size, mtime, digest = row
+        if (size, mtime) == indexsource(indexfilename):
+            return True
+        return size == os.path.getsize(indexfilename) and \
+            digest == hashfile(indexfilename)
+
+    @classmethod
+    def write(cls, filename, indexentries, indexfilename=None):
+        """Writes indexentries, a dict mapping each headword to a list
+        of [start, size] pairs, to filename in one transaction.  They
+        should come from indexfilename, which is recorded as the source
+        of the file if given."""
+        tmpfilename = _tempname(filename)
+        try:
+            cls._write(tmpfilename, indexentries, indexfilename)
+            os.replace(tmpfilename, filename)
+        except BaseException:
+            os.remove(tmpfilename)
+            raise
+
+    @classmethod
+    def _write(cls, filename, indexentries, indexfilename):
+        conn = sqlite3.connect(filename)
+        try:
+            conn.execute("pragma journal_mode = off")
+            conn.execute("pragma synchronous = off")
+            with conn:
+                conn.execute("create table definitions ("
+                             "id integer primary key, "
+                             "word text not null, "
+                             "norm text not null, "
+                             "position integer not null, "
+                             "size integer not null)")
+                conn.executemany(
+                    "insert into definitions (word, norm, position, size) "
+                    "values (?, ?, ?, ?)",
+                    ((word, word.lower(), start, size)
+                     for word, entries in indexentries.items()
+                     for start, size in entries))
+                conn.execute("create index definitions_norm "
+                             "on definitions (norm)")
+                conn.execute("create table source (size integer, "
+                             "mtime integer, sha256 text)")
+                if indexfilename is not None:
+                    conn.execute("insert into source values (?, ?, ?)",
+                                 indexsource(indexfilename) +
+                                 (hashfile(indexfilename), ))
+                conn.execute("pragma user_version = %d" % cls.VERSION)
+            conn.execute("vacuum")
+        finally:
+            conn.close()
+
+    @lookupstats.traced('sqlite lookup', _filename)
+    def lookup(self, word):
+        """Returns a list of [start, size] pairs for word."""
+        rows = self._conn.execute(
+            "select position, size from definitions "
+            "where norm = ? and word = ? order by id", (word.lower(), word))
+        return [list(row) for row in rows]
+
+    def __contains__(self, word):
+        rows = self._conn.execute(
+            "select 1 from definitions where norm = ? and word = ? limit 1",
+            (word.lower(), word))
+        return rows.fetchone() is not None
+
+    def keys(self, prefix=""):
+        """Returns an iterator over the distinct headwords starting with
+        prefix, ordered by their lower-cased form."""
+        norm = prefix.lower()
+        rows = self._conn.execute(
+            "select distinct word from definitions "
+            "where norm >= ? and norm < ? order by norm",
+            (norm, norm + "\U0010ffff"))
+        for row in rows:
+            if row[0].startswith(prefix):
+                yield row[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class HeadwordIndex:
+
+    """Base class of the auxiliary indexes that DictDB derives from a
+    text index and keeps next to it: a sorted list of the distinct
+    headwords plus whatever tables the subclass needs, in one file that
+    is mapped into memory.
+
+    Every file starts with MAGIC and a byte order mark, followed by the
+    size and mtime (ns) of the text index it was built from, so that a
+    stale file is detected and rebuilt."""
+
+    MAGIC = None
+
+    def __init__(self, data, source=None):
+        """data is a buffer holding the index, such as an mmap of the
+        file.  If source is the (size, mtime) of the text index and does
+        not match the header, ValueError is raised."""
+        self._data = data
+        self._views = []
+        if bytes(data[:8]) != self._magic():
+            raise ValueError("not a %s" % self.__class__.__name__)
+        if source is not None and \
+                struct.unpack("=2Q", data[8:24]) != tuple(source):
+            raise ValueError("%s is out of date" % self.__class__.__name__)
+        self._pos = 24
+
+    @classmethod
+    def _magic(cls):
+        if sys.byteorder == "little":
+            return cls.MAGIC + b"<"
+        return cls.MAGIC + b">"
+
+    def _header(self, fmt):
+        """Unpacks the next fields of the header."""
+        size = struct.calcsize(fmt)
+        values = struct.unpack(fmt, self._data[self._pos:self._pos + size])
+        self._pos += size
+        return values
+
+    def _array(self, typecode, length):
+        """Returns a view on the next array of the file."""
+        size = array(typecode).itemsize * length
+        view = memoryview(self._data)[self._pos:self._pos + size]
+        self._pos += size
+        if typecode != "B":
+            view = view.cast(typecode)
+        self._views.append(view)
+        return view
+
+    def _readkeys(self, count, keybytes):
+        self._keyoffsets = self._array("I", count + 1)
+        self._keys = self._array("B", keybytes)
+        self._count = count
+
+    @staticmethod
+    def _writekeys(keys):
+        """Returns the parts that _readkeys() reads for keys."""
+        encoded = [key.encode("utf-8") for key in keys]
+        keyoffsets = [0]
+        for key in encoded:
+            keyoffsets.append(keyoffsets[-1] + len(key))
+        return [array("I", keyoffsets).tobytes()] + encoded
+
+    @staticmethod
+    def _idtype(count):
+        # Small dictionaries store their headword ids in 16 bits.
+        return "H" if count <= 0xffff else "I"
+
+    @staticmethod
+    def source(indexfilename):
+        """Returns the (size, mtime) identifying a text index."""
+        return indexsource(indexfilename)
+
+    @classmethod
+    def open(cls, filename, source=None):
+        with open(filename, "rb") as indexfile:
+            try:
+                data = mmap.mmap(indexfile.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError("%s is empty" % filename)
+        return cls(data, source)
+
+    @classmethod
+    def build(cls, words, source=(0, 0)):
+        """Builds the index of the headwords in words and returns it as
+        bytes, ready to be written out or passed to the constructor."""
+        raise NotImplementedError
+
+    @classmethod
+    def write(cls, filename, words, source=(0, 0)):
+        """Builds the index of words into filename and returns its
+        contents."""
+        data = cls.build(words, source)
+        tmpfilename = _tempname(filename)
+        try:
+            with open(tmpfilename, "wb") as indexfile:
+                indexfile.write(data)
+            os.replace(tmpfilename, filename)
+        except BaseException:
+            os.remove(tmpfilename)
+            raise
+        return data
+
+    def __len__(self):
+        return self._count
+
+    def _key(self, i):
+        return bytes(self._keys[self._keyoffsets[i]:
+                                self._keyoffsets[i + 1]]).decode("utf-8")
+
+    @staticmethod
+    def _find(values, value):
+        """Returns the position of the first item of the sorted array
+        values not less than value."""
+        lo = 0
+        hi = len(values)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if values[mid] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def prefixes(self, prefix):
+        """Returns the sorted list of headwords starting with prefix."""
+        lo = 0
+        hi = self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        retval = []
+        for i in range(lo, self._count):
+            key = self._key(i)
+            if not key.startswith(prefix):
+                break
+            retval.append(key)
+        return retval
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+class TrigramIndex(HeadwordIndex):
+
+    """Trigram inverted index over the headwords of a dictionary, for
+    substring suggestions.
+
+    For every trigram of the lower-cased headwords the file lists the
+    ids of the headwords holding it.  Trigrams are stored by CRC-32, so
+    the tables are fixed width and can be bisected in place; a hash
+    collision only adds candidates, which are checked against the query
+    anyway.
+
+    Layout after the common header (see HeadwordIndex):
+
+        counts      4 x 8 bytes: keys, trigrams, postings, key bytes
+        keyoffsets  keys + 1 uint32
+        keys        the headwords, sorted, UTF-8, back to back
+        hashes      trigrams uint32, sorted
+        starts      trigrams + 1 uint32, offsets into postings
+        postings    postings headword ids, uint16 if there are at most
+                    65535 keys and uint32 otherwise"""
+
+    MAGIC = b"DICTTRI"
+
+    def __init__(self, data, source=None):
+        HeadwordIndex.__init__(self, data, source)
+        nkeys, ntrigrams, npostings, keybytes = self._header("=4Q")
+        self._readkeys(nkeys, keybytes)
+        self._hashes = self._array("I", ntrigrams)
+        self._starts = self._array("I", ntrigrams + 1)
+        self._postings = self._array(self._idtype(nkeys), npostings)
+
+    @staticmethod
+    def _hash(trigram):
+        return zlib.crc32(trigram.encode("utf-8"))
+
+    @classmethod
+    def build(cls, words, source=(0, 0)):
+        keys = sorted(set(words))
+        postings = {}
+        for i, key in enumerate(keys):
+            lowered = key.lower()
+            trigrams = set([lowered[j:j + 3]
+                            for j in range(len(lowered) - 2)])
+            for trigram in trigrams:
+                h = cls._hash(trigram)
+                if h not in postings:
+                    postings[h] = []
+                postings[h].append(i)
+
+        hashes = sorted(postings)
+        starts = [0]
+        allpostings = array(cls._idtype(len(keys)))
+        for h in hashes:
+            # Colliding trigrams may have listed an id twice.
+            allpostings.extend(sorted(set(postings[h])))
+            starts.append(len(allpostings))
+        keyparts = cls._writekeys(keys)
+
+        return b"".join([cls._magic(),
+                         struct.pack("=2Q", *source),
+                         struct.pack("=4Q", len(keys), len(hashes),
+                                     len(allpostings),
+                                     sum(map(len, keyparts[1:])))] +
+                        keyparts +
+                        [array("I", hashes).tobytes(),
+                         array("I", starts).tobytes(),
+                         allpostings.tobytes()])
+
+    def _posting(self, trigram):
+        h = self._hash(trigram)
+        i = self._find(self._hashes, h)
+        if i == len(self._hashes) or self._hashes[i] != h:
+            return self._postings[0:0]
+        return self._postings[self._starts[i]:self._starts[i + 1]]
+
+    def substrings(self, word, ignorecase=0):
+        """Returns the sorted list of headwords containing word, which
+        must be at least three characters long, regardless of case if
+        ignorecase is nonzero."""
+        lowered = word.lower()
+        trigrams = set([lowered[j:j + 3] for j in range(len(lowered) - 2)])
+        postings = sorted([self._posting(trigram) for trigram in trigrams],
+                          key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting)
+        retval = []
+        for i in sorted(candidates):
+            key = self._key(i)
+            if ignorecase and lowered in key.lower() or word in key:
+                retval.append(key)
+        return retval
+
+
+def editdistance(a, b, maximum=None):
+    """Returns the optimal string alignment distance between a and b:
+    the number of insertions, deletions, substitutions and transpositions
+    of adjacent characters turning one into the other.  If maximum is
+    given, gives up and returns maximum + 1 as soon as the distance is
+    known to exceed it."""
+    if maximum is not None and abs(len(a) - len(b)) > maximum:
+        return maximum + 1
+    previous = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, row = previous, row, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(previous[j] + 1, row[j - 1] + 1,
+                         previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and \
+                    a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+        if maximum is not None and min(row) > maximum:
+            return maximum + 1
+    return row[-1]
+
+
+class SpellIndex(HeadwordIndex):
+
+    """Symmetric delete (SymSpell) index over the headwords of a
+    dictionary, for suggesting corrections of misspelt words.
+
+    Every lower-cased headword is stored under the strings obtained by
+    deleting up to one of its characters.  A query generates the same
+    deletions of itself and looks them up: any headword sharing one is
+    within two edits of the query, and every headword within one edit
+    (including a transposition) shares one.  Only the first PREFIX
+    characters are used, which keeps the index small; the candidates are
+    then ranked by their real edit distance.
+
+    Deletions are stored by CRC-32, like the trigrams of TrigramIndex.
+
+    Layout after the common header (see HeadwordIndex):
+
+        counts      3 x 8 bytes: keys, entries, key bytes
+        keyoffsets  keys + 1 uint32
+        keys        the headwords, sorted, UTF-8, back to back
+        hashes      entries uint32, sorted
+        ids         entries headword ids (uint16 or uint32, as for
+                    TrigramIndex), in the order of hashes"""
+
+    MAGIC = b"DICTSYM"
+    PREFIX = 7
+    MAXDISTANCE = 2
+
+    def __init__(self, data, source=None):
+        HeadwordIndex.__init__(self, data, source)
+        nkeys, nentries, keybytes = self._header("=3Q")
+        self._readkeys(nkeys, keybytes)
+        self._hashes = self._array("I", nentries)
+        self._ids = self._array(self._idtype(nkeys), nentries)
+
+    @classmethod
+    def _deletes(cls, word):
+        """Returns the hashes of word and of word with one character
+        deleted, using only its first PREFIX characters."""
+        word = word.lower()[:cls.PREFIX]
+        variants = set([word[:i] + word[i + 1:] for i in range(len(word))])
+        variants.add(word)
+        return set([zlib.crc32(variant.encode("utf-8"))
+                    for variant in variants])
+
+    @classmethod
+    def build(cls, words, source=(0, 0)):
+        keys = sorted(set(words))
+        entries = []
+        for i, key in enumerate(keys):
+            for h in cls._deletes(key):
+                entries.append((h << 32) | i)
+        entries.sort()
+        hashes = array("I", [entry >> 32 for entry in entries])
+        ids = array(cls._idtype(len(keys)),
+                    [entry & 0xffffffff for entry in entries])
+        keyparts = cls._writekeys(keys)
+
+        return b"".join([cls._magic(),
+                         struct.pack("=2Q", *source),
+                         struct.pack("=3Q", len(keys), len(entries),
+                                     sum(map(len, keyparts[1:])))] +
+                        keyparts +
+                        [hashes.tobytes(), ids.tobytes()])
+
+    def corrections(self, word, limit=None):
+        """Returns the headwords within MAXDISTANCE edits of word, ignoring
+        case, closest first; at equal distance those closest in length,
+        then alphabetically.  word itself is not included."""
+        lowered = word.lower()
+        candidates = set()
+        for h in self._deletes(lowered):
+            i = self._find(self._hashes, h)
+            while i < len(self._hashes) and self._hashes[i] == h:
+                candidates.add(self._ids[i])
+                i += 1
+        ranked = []
+        for i in candidates:
+            key = self._key(i)
+            distance = editdistance(lowered, key.lower(), self.MAXDISTANCE)
+            if 0 < distance <= self.MAXDISTANCE:
+                ranked.append((distance, abs(len(key) - len(word)), key))
+        ranked.sort()
+        return [key for distance, lengthdiff, key in ranked[:limit]]
+
+
+def rebuild_sql_index(basename):
+    """Rewrites basename.index.db from the text index, in the current
+    SQLIndex schema.  Used to migrate files made by older versions."""
+    with open(basename + ".index", encoding="utf-8") as indexfile:
+        indexentries = loadindex(indexfile.read())
+    SQLIndex.write(basename + ".index.db", indexentries,
+                   basename + ".index")
+
+
+class DefinitionCache:
+
+    """LRU cache of looked up definitions, bounded by an estimate of the
+    memory they take.
+
+    Keys are (dictionary, headword), so one cache can serve every open
+    dictionary: by default DictDB uses the process-wide
+    definitioncache.  A dictionary is identified by its files together
+    with their size and mtime when it was opened, so the entries of one
+    that is written again are not served to the handles opened after.
+    Misses are cached too, as an empty tuple, since looking up a word
+    that is not there costs as much as one that is.
+    The cache may be shared between threads."""
+
+    # Rough cost of an entry besides its strings: key tuple, list node...
+    _OVERHEAD = 200
+
+    def __init__(self, max_bytes=2 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _cost(cls, key, definitions):
+        return cls._OVERHEAD + len(key[1]) + sum(map(len, definitions))
+
+    def get(self, key):
+        """Returns the tuple of definitions stored for key, or None."""
+        with self._lock:
+            definitions = self._entries.get(key)
+            if definitions is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return definitions
+
+    def put(self, key, definitions):
+        definitions = tuple(definitions)
+        cost = self._cost(key, definitions)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._cost(key, self._entries.pop(key))
+            if cost > self.max_bytes:
+                return
+            self._entries[key] = definitions
+            self._bytes += cost
+            while self._bytes > self.max_bytes:
+                oldkey, olddefinitions = self._entries.popitem(last=False)
+                self._bytes -= self._cost(oldkey, olddefinitions)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def info(self):
+        """Returns a dict of statistics: hits, misses, entries, bytes
+        (estimated) and max_bytes."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self._entries), 'bytes': self._bytes,
+                    'max_bytes': self.max_bytes}
+
+
+definitioncache = DefinitionCache()
+
+
+class IndexWriter:
+
+    """Writes a sorted dict index, holding a bounded amount of it in
+    memory.
+
+    Entries are collected in memory until they take about maxbytes,
+    then sorted and written to a temporary file (a run) next to the
+    index.  finish() merges the runs and the entries left in memory
+    into the index file, so an index of any size can be written with
+    maxbytes of memory, plus a line per run."""
+
+    # Rough memory taken by an entry besides its characters: the line,
+    # its slot in the list and, while sorting, its key.
+    _OVERHEAD = 200
+
+    def __init__(self, filename, maxbytes=64 * 1024 * 1024):
+        self.filename = filename
+        self.maxbytes = maxbytes
+        self.count = 0
+        self._lines = []
+        self._size = 0
+        self._runs = []
+        # (word, start, size, runs): entries to drop from the first
+        # runs runs when merging them.
+        self._tombstones = []
+
+    def add(self, word, start, size):
+        line = "%s\t%s\t%s" % (word, b64_encode(start), b64_encode(size))
+        self._lines.append(line)
+        self._size += 3 * len(line) + self._OVERHEAD
+        self.count += 1
+        if self._size > self.maxbytes:
+            self._spill()
+
+    def delete(self, word, start=None, size=None):
+        """Drops the entries of word added so far, only those with the
+        given start and size if not None.  Returns the number of them
+        still in memory; those already in a run are dropped by
+        finish()."""
+        if self._runs:
+            self._tombstones.append((word, start, size, len(self._runs)))
+        lines = [line for line in self._lines
+                 if not self._matches(line, word, start, size)]
+        deleted = len(self._lines) - len(lines)
+        self._lines = lines
+        self.count -= deleted
+        return deleted
+
+    @staticmethod
+    def _matches(line, word, start, size):
+        fields = line.split("\t")
+        return fields[0] == word and \
+            (start is None or b64_decode(fields[1]) == start) and \
+            (size is None or b64_decode(fields[2]) == size)
+
+    def _spill(self):
+        self._lines.sort(key=sortkey)
+        fd, filename = tempfile.mkstemp(
+            prefix=os.path.basename(self.filename) + ".",
+            suffix=".run", dir=os.path.dirname(self.filename) or ".")
+        self._runs.append(filename)
+        with open(fd, "w", encoding="utf-8") as run:
+            run.writelines([line + "\n" for line in self._lines])
+        self._lines = []
+        self._size = 0
+
+    def _readrun(self, number):
+        tombstones = {}
+        for word, start, size, runs in self._tombstones:
+            if number < runs:
+                tombstones.setdefault(word, []).append((start, size))
+        with open(self._runs[number], encoding="utf-8") as run:
+            for line in run:
+                line = line[:-1]
+                word = line.split("\t", 1)[0]
+                if word in tombstones and \
+                        any(self._matches(line, word, start, size)
+                            for start, size in tombstones[word]):
+                    continue
+                yield line
+
+    def finish(self, dosort=1):
+        """Writes the index file, sorted unless dosort is false, and
+        removes the runs."""
+        try:
+            runs = [self._readrun(number)
+                    for number in range(len(self._runs))]
+            if dosort:
+                self._lines.sort(key=sortkey)
+                lines = heapq.merge(*(runs + [self._lines]), key=sortkey)
+            else:
+                lines = itertools.chain(*(runs + [self._lines]))
+            tmpfilename = _tempname(self.filename)
+            try:
+                with open(tmpfilename, "w", encoding="utf-8") as index:
+                    for line in lines:
+                        index.write(line + "\n")
+                os.replace(tmpfilename, self.filename)
+            except BaseException:
+                os.remove(tmpfilename)
+                raise
+        finally:
+            self.abort()
+
+    def abort(self):
+        """Removes the runs, leaving the index file alone."""
+        for filename in self._runs:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+        self._runs = []
+        self._lines = []
+
+
 class DictDB:
 
-    def __init__(self, basename, mode='read', quiet=0):
+    def __init__(self, basename, mode='read', quiet=0, lazy=0, sqlindex=1,
+                 cache=definitioncache, progress=None,
+                 indexbuffer=64 * 1024 * 1024, dictzip=0,
+                 chunklen=DICTZIP_CHUNKLEN):
         """Initialize a DictDB object.
 
         Mode must be one of:
 
         read -- read-only access
 
-        write -- write-only access, truncates existing files, does not work
-        with .dz.  dict created if nonexistant.
+        write -- write-only access, truncates existing files.  dict
+        created if nonexistant.
 
-        update -- read/write access, dict created if nonexistant.  Does not
-        work with .dz.
+        update -- read/write access, dict created if nonexistant.
 
-        Read can read dict or dict.dz files.  Write and update will NOT work
-        with dict.dz files.
+        Read can read dict or dict.dz files.  Write and update work on
+        a dict.dz file if there is one, or in write mode if dictzip is
+        nonzero: the definitions then go to a plain .dict.tmp file,
+        which finish() compresses with write_dictzip(), in chunks of
+        chunklen bytes.  Update mode first inflates the whole dict.dz
+        to it.
 
         If quiet is nonzero, status messages
-        will be suppressed."""
+        will be suppressed.
+
+        If lazy is nonzero and mode is read, the text index is not loaded;
+        lookups bisect the sorted index file instead (see TextIndex).
+        An index that turns out not to be sorted, when opened or by a
+        later lookup, is opened as if lazy were zero.  A compiled
+        .index.bin still comes first.
+
+        In read mode an existing .index.db is used unless sqlindex is
+        zero.  One written by an older version of this module is rebuilt
+        in place; if that fails the text index is used.
+
+        In read mode getdef() results go through cache, a DefinitionCache
+        (the process-wide definitioncache by default); None disables
+        caching.
+
+        If progress is given and the text index has to be parsed, it is
+        called with the fraction parsed so far, from 0.0 to 1.0.
+
+        In read mode a DictDB can be shared by several threads, except
+        for the generators returned by iter_suggestions().
+
+        In write mode the index is not kept in memory but written out
+        by an IndexWriter, which sorts it holding at most about
+        indexbuffer bytes of it in memory; see addentries()."""
 
         self.mode = mode
         self.quiet = quiet
+        self.lazy = lazy
         self.indexentries = {}
         self.count = 0
         self.basename = basename
-        self._index_conn = None
+        self.sqlindex = sqlindex
+        self.cache = cache if mode == 'read' else None
+        self.progress = progress
+        self.indexbuffer = indexbuffer
+        self._indexwriter = None
+        self.chunklen = chunklen
+        # The plain copy of a .dict.dz being written or updated.
+        self._plainfilename = None
+        self._index = None
+        self._trigrams = None
+        self._spelling = None
+        # [word, prefixes, others] of the last iter_suggestions() call,
+        # others being None until looked up; see _narrow().
+        self._narrowing = None
+        # The files and indexes keep a position, and the indexes are
+        # built on first use; lookups take turns.
+        self._lock = threading.RLock()
 
         self.indexfilename = self.basename + ".index"
-        if os.path.isfile(self.basename + ".dict.dz"):
+        if os.path.isfile(self.basename + ".dict.dz") or \
+                (mode == 'write' and dictzip):
             self.dictfilename = self.basename + ".dict.dz"
             self.usecompression = 1
         else:
@@ -126,24 +1531,36 @@ class DictDB:
         if mode == 'read':
             self.indexfile = open(self.indexfilename, "r")
             if self.usecompression:
-                self.dictfile = gzip.GzipFile(self.dictfilename, "r")
+                self.dictfile = open_dictfile(self.dictfilename)
             else:
                 self.dictfile = open(self.dictfilename, "rb")
+            self._cachekey = self._fileidentity()
             self._initindex()
         elif mode == 'write':
-            self.indexfile = open(self.indexfilename, "w")
+            # The index is written by finish(), until then the old one
+            # stays in place.
+            self.indexfile = None
+            self._indexwriter = IndexWriter(self.indexfilename, indexbuffer)
             if self.usecompression:
-                raise ValueError("'write' mode incompatible with .dz files")
+                self._plainfilename = self.basename + ".dict.tmp"
+                self.dictfile = open(self._plainfilename, "wb")
             else:
                 self.dictfile = open(self.dictfilename, "wb")
         elif mode == 'update':
             try:
-                self.indexfile = open(self.indexfilename, "r+b")
+                self.indexfile = open(self.indexfilename, "r",
+                                      encoding="utf-8")
             except IOError:
-                self.indexfile = open(self.indexfilename, "w+b")
+                self.indexfile = open(self.indexfilename, "w+",
+                                      encoding="utf-8")
             if self.usecompression:
-                # Open it read-only since we don't support mods.
-                self.dictfile = gzip.GzipFile(self.dictfilename, "r")
+                self._plainfilename = self.basename + ".dict.tmp"
+                self.dictfile = open(self._plainfilename, "w+b")
+                compressed = open_dictfile(self.dictfilename)
+                try:
+                    shutil.copyfileobj(compressed, self.dictfile)
+                finally:
+                    compressed.close()
             else:
                 try:
                     self.dictfile = open(self.dictfilename, "r+b")
@@ -158,38 +1575,99 @@ class DictDB:
         #                [short_headword])
         # self.writeentry(info_headword + "\n" + longinfo, [info_headword])
 
+    @lookupstats.traced('db index load', _basename)
     def _initindex(self):
         """Load the entire index off disk into memory."""
-        if os.path.exists(self.indexfilename + '.db'):
+        if self.mode == 'read':
+            # map the compiled index, if there is one up to date
+            try:
+                self._index = BinaryIndex(self.indexfilename + '.bin',
+                                          indexsource(self.indexfilename))
+                return
+            except (OSError, ValueError):
+                pass
+
+        if self.mode == 'read' and self.lazy:
+            try:
+                self._index = TextIndex(self.indexfilename)
+                return
+            except IndexOrderError:
+                pass
+
+        self._initfullindex()
+
+    def _initfullindex(self):
+        """Opens the .index.db, or else loads the whole text index."""
+        if self.mode == 'read' and self.sqlindex and \
+                os.path.exists(self.indexfilename + '.db'):
             # there are a sql index, use it
-            self._index_conn = sqlite3.connect(self.indexfilename + '.db')
-            return
+            try:
+                self._index = SQLIndex(self.indexfilename + '.db',
+                                       self.indexfilename)
+                return
+            except ValueError:
+                pass
+            try:
+                rebuild_sql_index(self.basename)
+                self._index = SQLIndex(self.indexfilename + '.db',
+                                       self.indexfilename)
+                return
+            except (OSError, sqlite3.Error):
+                # Probably a read-only installation; the text index
+                # is slower to load but just as good.
+                pass
+
+        self._loadindex()
+
+    def _loadindex(self):
+        self.indexfile.seek(0)
+        self.indexentries = loadindex(self.indexfile.read(), self.progress)
 
+        if self.mode == 'read':
+            # Compile the index so the next open can just map it.  The
+            # dictionary directory may well be read-only; that is fine.
+            try:
+                self.create_binary_index()
+            except OSError:
+                pass
+
+    def _unsorted(self):
+        """Called when the lazy TextIndex finds its file out of order:
+        opens the index the way a DictDB that is not lazy would, but for
+        the .index.bin, which is missing or out of date."""
+        self.update("%s is not sorted, loading it\n" % self.indexfilename)
+        self._index.close()
+        self._index = None
+        self._initfullindex()
+
+    def _allindexentries(self):
+        """Returns the whole index, reading it off disk if it is not
+        loaded in memory."""
+        if self._index is None:
+            return self.indexentries
         self.indexfile.seek(0)
-        for line in self.indexfile:
-            splits = line.rstrip().split("\t")
-            if splits[0] not in self.indexentries:
-                self.indexentries[splits[0]] = []
-            self.indexentries[splits[0]].append([b64_decode(splits[1]),
-                                                 b64_decode(splits[2])])
+        return loadindex(self.indexfile.read(), self.progress)
+
+    def create_binary_index(self):
+        """Compiles the index into a memory-mapped BinaryIndex, stored
+        next to the text index."""
+        BinaryIndex.write(self.indexfilename + '.bin',
+                          self._allindexentries(),
+                          indexsource(self.indexfilename))
 
     def create_sql_index(self):
-        conn = sqlite3.connect(self.indexfilename + '.db')
-        conn.execute('CREATE TABLE definitions ' +
-                     '(word TEXT, position INTEGER, size INTEGER)')
-        conn.commit()
-
-        for word in list(self.indexentries.keys()):
-            values = self.indexentries[word][0]
-            conn.execute('insert into definitions values ' +
-                         '(?, ?, ?)', (memoryview(word.encode()), values[0], values[1]))
-        conn.commit()
-        conn.close()
+        """Writes the index to an SQLIndex stored next to the text
+        index."""
+        SQLIndex.write(self.indexfilename + '.db', self._allindexentries(),
+                       self.indexfilename)
 
     def addindexentry(self, word, start, size):
         """Adds an entry to the index.  word is the relevant word.
         start is the starting position in the dictionary and size is the
         size of the definition; both are integers."""
+        if self._indexwriter is not None:
+            self._indexwriter.add(word, start, size)
+            return
         if word not in self.indexentries:
             self.indexentries[word] = []
         self.indexentries[word].append([start, size])
@@ -210,8 +1688,12 @@ class DictDB:
         exist on-disk in the .dict file, but the dict server will just
         not "see" it -- there will be no way to get to it anymore.
 
-        Returns a count of the deleted entries."""
+        Returns a count of the deleted entries.  In write mode entries
+        already sorted out to disk by the IndexWriter are not counted,
+        though they are removed as well."""
 
+        if self._indexwriter is not None:
+            return self._indexwriter.delete(word, start, size)
         if word not in self.indexentries:
             return 0
         retval = 0
@@ -226,6 +1708,15 @@ class DictDB:
             del(self.indexentries[word])
         return retval
 
+    def _fileidentity(self):
+        """Returns what tells this version of the dictionary files from
+        the others, for the definition cache."""
+        identity = []
+        for filename in (self.dictfilename, self.indexfilename):
+            st = os.stat(filename)
+            identity += [filename, st.st_size, st.st_mtime_ns]
+        return tuple(identity)
+
     def update(self, string):
         """Writes string out, if not quiet."""
         if not self.quiet:
@@ -258,16 +1749,25 @@ class DictDB:
         headwords is a list specifying one or more words under which this
         definition should be indexed.  This function always adds \\n
         to the end of defstr."""
+        self.addentries([(defstr, headwords)])
+
+    def addentries(self, entries):
+        """Writes the (defstr, headwords) entries of the iterable
+        entries, as addentry() would, one after the other.  Nothing but
+        the index entries of the last indexbuffer bytes is kept in
+        memory in write mode, so entries can be a generator over a
+        dictionary of any size."""
         self.dictfile.seek(0, 2)        # Seek to end of file
         start = self.dictfile.tell()
-        defstr += "\n"
-        self.dictfile.write(defstr)
-        for word in headwords:
-            self.addindexentry(word, start, len(defstr))
-            self.count += 1
-
-        if self.count % 1000 == 0:
-            self.update("Processed %d records\r" % self.count)
+        for defstr, headwords in entries:
+            data = (defstr + "\n").encode("utf-8")
+            self.dictfile.write(data)
+            for word in headwords:
+                self.addindexentry(word, start, len(data))
+                self.count += 1
+                if self.count % 1000 == 0:
+                    self.update("Processed %d records\r" % self.count)
+            start += len(data)
 
     def finish(self, dosort=1):
         """Called to finish the writing process.
@@ -276,109 +1776,249 @@ class DictDB:
 
         dosort is optional and defaults to true.  If set to false,
         dictlib will not sort the index file.  In this case, you
-        MUST manually sort it through "sort -df" before it can be used."""
+        MUST manually sort it through "sort -df" before it can be used.
 
-        self.update("Processed %d records.\n" % self.count)
+        A dict.dz is compressed last, replacing the old one."""
 
-        if dosort:
-            self.update("Sorting index: converting")
-
-            indexlist = []
-            for word, defs in list(self.indexentries.items()):
-                for thisdef in defs:
-                    indexlist.append("%s\t%s\t%s" % (word,
-                                                     b64_encode(thisdef[0]),
-                                                     b64_encode(thisdef[1])))
-
-            self.update(" mapping")
-
-            sortmap = {}
-            for entry in indexlist:
-                norm = sortnormalize(entry)
-                if norm in sortmap:
-                    sortmap[norm].append(entry)
-                    sortmap[norm].sort(sortfunc)
-                else:
-                    sortmap[norm] = [entry]
-
-            self.update(" listing")
-
-            normalizedentries = list(sortmap.keys())
-
-            self.update(" sorting")
-
-            normalizedentries.sort()
-
-            self.update(" re-mapping")
-            indexlist = []
-
-            for normentry in normalizedentries:
-                for entry in sortmap[normentry]:
-                    indexlist.append(entry)
+        self.update("Processed %d records.\n" % self.count)
 
-            self.update(", done.\n")
+        if self._indexwriter is not None:
+            writer = self._indexwriter
+        else:
+            # update: the index, old entries and new, is in memory.
+            self.indexfile.close()
+            writer = IndexWriter(self.indexfilename, self.indexbuffer)
+            for word, defs in self.indexentries.items():
+                for start, size in defs:
+                    writer.add(word, start, size)
 
         self.update("Writing index...\n")
+        try:
+            writer.finish(dosort)
+        finally:
+            self.dictfile.close()
 
-        self.indexfile.seek(0)
-
-        for entry in indexlist:
-            self.indexfile.write(entry + "\n")
-
-        if self.mode == 'update':
-            # In case things were deleted
-            self.indexfile.truncate()
-        self.indexfile.close()
-        self.dictfile.close()
+        if self._plainfilename is not None:
+            self.update("Compressing %s...\n" % self.dictfilename)
+            write_dictzip(self._plainfilename, self.dictfilename,
+                          self.chunklen)
+            os.remove(self._plainfilename)
 
         self.update("Complete.\n")
 
     def getdeflist(self):
         """Returns a list of strings naming all definitions contained
         in this dictionary."""
-        return list(self.indexentries.keys())
-
-    def get_suggestions(self, word):
+        with self._lock:
+            if self._index is not None:
+                return list(self._index.keys())
+            return list(self.indexentries.keys())
+
+    def getprefixlist(self, prefix):
+        """Returns a list of strings naming all definitions whose
+        headword starts with prefix."""
+        with self._lock:
+            while self._index is not None:
+                try:
+                    return list(self._index.keys(prefix))
+                except IndexOrderError:
+                    self._unsorted()
+            return [word for word in self.indexentries
+                    if word.startswith(prefix)]
+
+    def getsubstringlist(self, word, ignorecase=0):
+        """Returns a sorted list of the headwords containing word, which
+        must be at least three characters long, regardless of case if
+        ignorecase is nonzero."""
+        with self._lock:
+            return self._gettrigramindex().substrings(word, ignorecase)
+
+    def _gettrigramindex(self):
+        """Returns the TrigramIndex of this dictionary, mapping the one
+        stored next to the index or building it on first use."""
+        if self._trigrams is not None:
+            return self._trigrams
+        filename = self.indexfilename + '.tri'
+        source = TrigramIndex.source(self.indexfilename)
+        try:
+            self._trigrams = TrigramIndex.open(filename, source)
+            return self._trigrams
+        except (OSError, ValueError):
+            pass
+        self.update("Building trigram index\n")
+        try:
+            data = TrigramIndex.write(filename, self.getdeflist(), source)
+        except OSError:
+            # Read-only installation: keep it in memory only.
+            data = TrigramIndex.build(self.getdeflist(), source)
+        self._trigrams = TrigramIndex(data, source)
+        return self._trigrams
+
+    def _getspellindex(self):
+        """Returns the SpellIndex of this dictionary, like
+        _gettrigramindex()."""
+        if self._spelling is not None:
+            return self._spelling
+        filename = self.indexfilename + '.sym'
+        source = SpellIndex.source(self.indexfilename)
+        try:
+            self._spelling = SpellIndex.open(filename, source)
+            return self._spelling
+        except (OSError, ValueError):
+            pass
+        self.update("Building spelling index\n")
+        try:
+            data = SpellIndex.write(filename, self.getdeflist(), source)
+        except OSError:
+            data = SpellIndex.build(self.getdeflist(), source)
+        self._spelling = SpellIndex(data, source)
+        return self._spelling
+
+    def create_spell_index(self):
+        """Writes the SpellIndex used for corrections next to the text
+        index."""
+        SpellIndex.write(self.indexfilename + '.sym', self.getdeflist(),
+                         SpellIndex.source(self.indexfilename))
+
+    def get_corrections(self, word, limit=None):
+        """Returns headwords close to word in spelling, closest first;
+        see SpellIndex.corrections().  Words of less than three
+        characters are too short to correct."""
+        if len(word) < 3:
+            return []
+        with self._lock:
+            return self._getspellindex().corrections(word, limit)
+
+    def create_trigram_index(self):
+        """Writes the TrigramIndex used for suggestions next to the text
+        index."""
+        TrigramIndex.write(self.indexfilename + '.tri', self.getdeflist(),
+                           TrigramIndex.source(self.indexfilename))
+
+    def iter_suggestions(self, word, substrings=True):
+        """Yields the headwords containing word, lower-cased, best first:
+        the exact match, then the headwords starting with word, then the
+        other ones containing it, shorter headwords first within each
+        group.  Queries shorter than a trigram, or substrings false,
+        only get the first two groups.
+
+        The substring group is only looked up once the caller has
+        consumed the others, so taking the first few results of a
+        query with many prefix matches is cheap."""
         word = word.lower()
-        suggestions = []
-        if self._index_conn is not None:
-            rows = self._index_conn.execute(
-                'select word from definitions where word like ?',
-                (memoryview('%{}%'.format(word).encode()), ))
-            for row in rows:
-                if type(row[0]) is bytes:
-                    suggestions.append(row[0].decode('utf-8'))
-                elif type(row[0]) is str:
-                    suggestions.append(row[0])
-                else:
-                    raise Exception('ERROR: get_suggestions received a non-string like object')
-                    # Errors should not be passed silently. FIXME
+        if not word:
+            return
+        last = self._narrowing
+        trigrams = self._gettrigramindex()
+        if last is not None and word.startswith(last[0]):
+            prefixes = [key for key in last[1] if key.startswith(word)]
+        elif last is not None and last[2] is not None and last[0] in word:
+            prefixes = self._narrow(last, word, True)
         else:
-            for key in self.getdeflist():
-                if word in key:
-                    suggestions.append(key)
-        return suggestions
+            # Sorted, so sorting by length keeps the alphabetical order
+            # within a length, and word itself comes first if present.
+            prefixes = trigrams.prefixes(word)
+            prefixes.sort(key=len)
+        narrowing = self._narrowing = [word, prefixes, None]
+        for key in prefixes:
+            yield key
+        if len(word) < 3 or not substrings:
+            return
+        if last is not None and last[2] is not None and last[0] in word:
+            others = self._narrow(last, word, False)
+        else:
+            others = [key for key in trigrams.substrings(word)
+                      if not key.startswith(word)]
+            others.sort(key=len)
+        narrowing[2] = others
+        for key in others:
+            yield key
+
+    @staticmethod
+    def _narrow(last, word, prefix):
+        """While a word is being typed, every headword containing the
+        new query also contains the last one, so the suggestions for it
+        can be picked among the last ones, all of them known once the
+        last query's substring group (last[2]) has been looked up.
+        Returns those starting with word if prefix, the other ones
+        containing it if not, in iter_suggestions() order."""
+        keys = [key for key in itertools.chain(last[1], last[2])
+                if word in key and key.startswith(word) == prefix]
+        keys.sort(key=lambda key: (len(key), key))
+        return keys
+
+    @lookupstats.traced('db suggestions', _basename)
+    def get_suggestions(self, word, limit=None, substrings=True):
+        """Returns a list of the first limit (all if None) results of
+        iter_suggestions(word, substrings).  Unlike iter_suggestions(),
+        safe to use from several threads."""
+        with self._lock:
+            return list(itertools.islice(
+                self.iter_suggestions(word, substrings), limit))
 
     def hasdef(self, word):
-        return word in self.indexentries
+        with self._lock:
+            while self._index is not None:
+                try:
+                    return word in self._index
+                except IndexOrderError:
+                    self._unsorted()
+            return word in self.indexentries
 
+    @lookupstats.traced('db getdef', _basename)
     def getdef(self, word):
         """Given a definition name, returns a list of strings with all
         matching definitions.  This is an *exact* match, not a
         case-insensitive one.  Returns [] if word is not in the dictionary."""
+        if self.cache is not None:
+            cached = self.cache.get((self._cachekey, word))
+            if cached is not None:
+                return list(cached)
         retval = []
-        if self._index_conn is not None:
-            rows = self._index_conn.execute(
-                'select * from definitions where word=? ', (memoryview(word.encode()), ))
-            for row in rows:
-                position = row[1]
-                size = row[2]
-                self.dictfile.seek(position)
-                retval.append(self.dictfile.read(size).decode())
-        else:
-            if not self.hasdef(word):
-                return retval
-            for start, length in self.indexentries[word]:
+        with self._lock:
+            entries = None
+            while entries is None and self._index is not None:
+                try:
+                    entries = self._index.lookup(word)
+                except IndexOrderError:
+                    self._unsorted()
+            if entries is None:
+                entries = self.indexentries.get(word, [])
+            for start, length in entries:
                 self.dictfile.seek(start)
                 retval.append(self.dictfile.read(length).decode())
+        if self.cache is not None:
+            self.cache.put((self._cachekey, word), retval)
         return retval
+
+    def estimate_memory(self):
+        """Returns a rough estimate, in bytes, of the memory this DictDB
+        holds on to.  Mapped indexes are not counted: their pages belong
+        to the page cache and are shared with other processes."""
+        size = 0
+        if self._index is None:
+            # A parsed index takes about a dozen times its size on disk.
+            size += 12 * os.path.getsize(self.indexfilename)
+        if isinstance(self.dictfile, DictzipFile):
+            size += self.dictfile.cachesize * self.dictfile.chunklen
+        for index in (self._trigrams, self._spelling):
+            if index is not None and not isinstance(index._data, mmap.mmap):
+                size += len(index._data)
+        return size
+
+    def close(self):
+        """Closes the files of a DictDB opened for reading.  (Use
+        finish() for the other modes.)"""
+        with self._lock:
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+            if self._trigrams is not None:
+                self._trigrams.close()
+                self._trigrams = None
+            if self._spelling is not None:
+                self._spelling.close()
+                self._spelling = None
+            self._narrowing = None
+            self.indexfile.close()
+            self.dictfile.close()
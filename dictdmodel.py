@@ -1,83 +1,217 @@
 import os
 import dictdlib
+import json
 import logging
+import lookupstats
+import threading
+from collections import OrderedDict
 
 lang_codes = {'afr': 'Afrikaans', 'ara': 'Arabic', 'deu': 'Deutsch',
               'eng': 'English', 'fra': 'French', 'hin': 'Hindi',
               'ita': 'Italian', 'por': 'Portuguese', 'spa': 'Spanish'}
 
+# Below this many matches, spelling corrections are suggested as well.
+_FEW_SUGGESTIONS = 5
+
 espeak_voices = {'afr': 'afrikaans', 'ara': 'Farsi', 'deu': 'german',
                  'eng': 'english_rp', 'fra': 'french', 'hin': 'hindi',
                  'ita': 'italian', 'por': 'brazil', 'spa': 'spanish-latin-am'}
 
 
+# Index files DictDB can use besides the text .index, by suffix.
+_INDEX_BACKENDS = {'.index.bin': 'binary', '.index.db': 'sql',
+                   '.index.tri': 'trigram', '.index.sym': 'spelling'}
+
+
 class Dictionaries:
 
-    def __init__(self, directory):
-        self._directory = directory
-        self._dict_list = []
-        self._read_available_data()
-        # TODO: monitor directory
+    """Catalog of the dictionaries (*.dict.dz) in a directory.
+
+    For each dictionary the catalog records its language pair, the size
+    and mtime of its .dict.dz and .index files, the extra index formats
+    available next to it and its number of index entries (headwords).
+    Counting those means reading the index, so the catalog is kept in
+    cache_file, if given, and a dictionary is only looked at again when
+    the size or mtime of its files changed.
+
+    refresh() rescans the directory, cheaply; call it when the directory
+    changes, for example from a Gio.FileMonitor."""
 
-    def _read_available_data(self):
-        self._dict_list = []
-        for file_name in os.listdir(self._directory):
-            if file_name.endswith('.dict.dz'):
-                self._dict_list.append(file_name.split('.')[0])
-                logging.debug('Adding %s', file_name)
+    _CACHE_VERSION = 1
+
+    def __init__(self, directory, cache_file=None):
+        self._directory = directory
+        self._cache_file = cache_file
+        self._catalog = {}
+        self._from = {}
+        self._to = {}
+        self._load_cache()
+        self.refresh()
+
+    def _load_cache(self):
+        if self._cache_file is None:
+            return
+        try:
+            with open(self._cache_file) as cache:
+                data = json.load(cache)
+        except (IOError, OSError, ValueError):
+            return
+        if data.get('version') == self._CACHE_VERSION and \
+                data.get('directory') == os.path.abspath(self._directory):
+            self._catalog = data['dictionaries']
+
+    def _save_cache(self):
+        if self._cache_file is None:
+            return
+        data = {'version': self._CACHE_VERSION,
+                'directory': os.path.abspath(self._directory),
+                'dictionaries': self._catalog}
+        try:
+            with open(self._cache_file + '.tmp', 'w') as cache:
+                json.dump(data, cache)
+            os.replace(self._cache_file + '.tmp', self._cache_file)
+        except (IOError, OSError):
+            logging.exception('Can not write %s', self._cache_file)
+
+    @staticmethod
+    def _stat(path):
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+
+    def refresh(self):
+        """Brings the catalog up to date with the directory.  Returns the
+        set of names of the dictionaries added, removed or modified."""
+        try:
+            file_names = set(os.listdir(self._directory))
+        except OSError:
+            logging.exception('Can not read %s', self._directory)
+            file_names = set()
+        changed = set()
+        saved = False
+        names = set([file_name[:-len('.dict.dz')]
+                     for file_name in file_names
+                     if file_name.endswith('.dict.dz') and
+                     file_name[:-len('.dict.dz')] + '.index' in file_names])
+
+        for dict_name in set(self._catalog) - names:
+            logging.debug('Removing %s', dict_name)
+            del self._catalog[dict_name]
+            changed.add(dict_name)
+
+        for dict_name in names:
+            base = os.path.join(self._directory, dict_name)
+            try:
+                files = [self._stat(base + '.dict.dz'),
+                         self._stat(base + '.index')]
+            except OSError:
+                # Removed while we looked.
+                continue
+            entry = self._catalog.get(dict_name)
+            if entry is None or entry['files'] != files:
+                logging.debug('Adding %s', dict_name)
+                entry = self._read_entry(dict_name, files)
+                self._catalog[dict_name] = entry
+                changed.add(dict_name)
+            backends = sorted(
+                [backend for suffix, backend in _INDEX_BACKENDS.items()
+                 if dict_name + suffix in file_names])
+            if entry['backends'] != backends:
+                entry['backends'] = backends
+                saved = True
+
+        if changed or saved:
+            self._save_cache()
+        self._from = {}
+        self._to = {}
+        for dict_name in sorted(self._catalog):
+            lang_from, lang_to = self._catalog[dict_name]['pair']
+            self._from.setdefault(lang_from, []).append(dict_name)
+            self._to.setdefault(lang_to, []).append(dict_name)
+        return changed
+
+    def _read_entry(self, dict_name, files):
+        with open(os.path.join(self._directory, dict_name + '.index'),
+                  'rb') as index:
+            headwords = index.read().count(b'\n')
+        lang_from, sep, lang_to = dict_name.partition('-')
+        return {'pair': [lang_from, lang_to], 'files': files,
+                'dict_size': files[0][0], 'index_size': files[1][0],
+                'headwords': headwords, 'backends': []}
+
+    def get_info(self, dict_name):
+        """Returns the catalog entry of dict_name, a dict with the keys
+        pair, dict_size, index_size, headwords and backends, or None."""
+        entry = self._catalog.get(dict_name)
+        if entry is None:
+            return None
+        return dict((key, value) for key, value in entry.items()
+                    if key != 'files')
 
     def get_dictionaries_from(self, lang=None):
-        dictionaries = []
-        for dict_name in self._dict_list:
-            if lang is None or dict_name.startswith('%s-' % lang):
-                dictionaries.append(dict_name)
-        return dictionaries
+        if lang is None:
+            return sorted(self._catalog)
+        return list(self._from.get(lang, []))
 
     def get_dictionaries_to(self, lang=None):
-        dictionaries = []
-        for dict_name in self._dict_list:
-            if lang is None or dict_name.endswith('-%s' % lang):
-                dictionaries.append(dict_name)
-        return dictionaries
+        if lang is None:
+            return sorted(self._catalog)
+        return list(self._to.get(lang, []))
 
     def get_languages_from(self, lang):
-        langs = []
-        for dict_name in self.get_dictionaries_from(lang):
-            lang_from = dict_name[4:]
-            if lang_from not in langs:
-                langs.append(lang_from)
-        return sorted(langs)
+        return sorted(set([self._catalog[dict_name]['pair'][1]
+                           for dict_name in self._from.get(lang, [])]))
 
     def get_languages_to(self, lang):
-        langs = []
-        for dict_name in self.get_dictionaries_to(lang):
-            lang_to = dict_name[0:3]
-            if lang_to not in langs:
-                langs.append(lang_to)
-        return sorted(langs)
+        return sorted(set([self._catalog[dict_name]['pair'][0]
+                           for dict_name in self._to.get(lang, [])]))
 
     def get_all_languages_origin(self):
-        langs = []
-        for dict_name in self.get_dictionaries_from():
-            lang = dict_name[0:3]
-            if lang not in langs:
-                langs.append(lang)
-        return sorted(langs)
+        return sorted(self._from)
+
+
+def _pair(self, *args):
+    # lookupstats key of the methods of Dictionary.
+    return '%s-%s' % (self._from_lang, self._to_lang)
 
 
 class Dictionary:
 
-    def __init__(self, directory, from_lang, to_lang):
+    def __init__(self, directory, from_lang, to_lang, quiet=0):
+        # Lazy: eng-deu and eng-spa, sorted, are then not loaded at all.
+        # The other shipped pairs are not sorted the way TextIndex needs,
+        # which is found out when opening them, and fall back to their
+        # .index.db or a full load, which compiles the .index.bin used
+        # from then on; dictbuild.py writes sorted indexes.
         self._db = dictdlib.DictDB("%s/%s-%s" %
-                                   (directory, from_lang, to_lang))
+                                   (directory, from_lang, to_lang),
+                                   quiet=quiet, lazy=1)
         self._from_lang = from_lang
         self._to_lang = to_lang
 
+    @lookupstats.traced('dictionary definition', _pair)
     def get_definition(self, word):
         return self._db.getdef(word)
 
-    def get_suggestions(self, word):
-        return self._db.get_suggestions(word)
+    @lookupstats.traced('dictionary suggestions', _pair)
+    def get_suggestions(self, word, limit=None):
+        suggestions = self._db.get_suggestions(word, limit)
+        few = _FEW_SUGGESTIONS
+        if limit is not None:
+            # A full page is never few, however small the page.
+            few = min(limit, few)
+        if len(suggestions) < few:
+            # Probably misspelt: offer the words it may have been.
+            wanted = None if limit is None else limit - len(suggestions)
+            for correction in self._db.get_corrections(word, wanted):
+                if correction not in suggestions:
+                    suggestions.append(correction)
+        return suggestions
+
+    def iter_suggestions(self, word):
+        return self._db.iter_suggestions(word)
+
+    def get_corrections(self, word, limit=None):
+        return self._db.get_corrections(word, limit)
 
     def get_from_lang(self):
         return self._from_lang
@@ -85,22 +219,122 @@ class Dictionary:
     def get_to_lang(self):
         return self._to_lang
 
+    def estimate_memory(self):
+        return self._db.estimate_memory()
+
+
+class DictionaryPool:
+
+    """Keeps the most recently used Dictionary handles open, so switching
+    back and forth between language pairs does not reload them.
+
+    Handles are evicted, least recently used first, once there are more
+    than max_handles of them or their estimated memory exceeds
+    max_bytes; the one just asked for is always kept.  An evicted handle
+    is not closed, since another thread may still be using it; it goes
+    away with its last reference.
+
+    The pool and its dictionaries can be used from several threads.
+    quiet is passed on to the dictionaries opened."""
+
+    def __init__(self, directory, max_handles=4, max_bytes=32 * 1024 * 1024,
+                 quiet=0):
+        self._directory = directory
+        self.max_handles = max_handles
+        self.max_bytes = max_bytes
+        self.quiet = quiet
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, from_lang, to_lang):
+        """Returns the Dictionary for the pair, opening it if needed."""
+        return self._get((from_lang, to_lang), ())
+
+    def _get(self, key, keep):
+        from_lang, to_lang = key
+        with self._lock:
+            if key in self._handles:
+                self._handles.move_to_end(key)
+                return self._handles[key]
+        # Open it outside the lock, it can take a while.
+        dictionary = Dictionary(self._directory, from_lang, to_lang,
+                                quiet=self.quiet)
+        with self._lock:
+            if key in self._handles:
+                # Someone else opened it meanwhile; use theirs.
+                self._handles.move_to_end(key)
+                return self._handles[key]
+            self._handles[key] = dictionary
+            self._evict(keep + (key, ))
+        return dictionary
+
+    def _evict(self, keep):
+        # Never the handles of the pairs in keep.
+        while True:
+            size = sum(dictionary.estimate_memory()
+                       for dictionary in self._handles.values())
+            if len(self._handles) <= self.max_handles and \
+                    size <= self.max_bytes:
+                break
+            victims = [key for key in self._handles if key not in keep]
+            if not victims:
+                break
+            del self._handles[victims[0]]
+            logging.debug('Evicting dictionary %s-%s', *victims[0])
+
+    def discard(self, from_lang, to_lang):
+        """Forgets the handle of the pair, if open, so the next get()
+        opens the files again; for dictionaries changed on disk."""
+        with self._lock:
+            self._handles.pop((from_lang, to_lang), None)
+
+    def __contains__(self, pair):
+        with self._lock:
+            return tuple(pair) in self._handles
+
+    def preload(self, pairs, current=None):
+        """Opens the (from_lang, to_lang) pairs in pairs on a background
+        thread, most important first.  current, the pair in use, is
+        never evicted for them, and there are at most max_handles - 1 of
+        them, so it keeps its place."""
+        current = tuple(current) if current is not None else None
+        pairs = [tuple(pair) for pair in pairs if tuple(pair) != current]
+        pairs = pairs[:max(self.max_handles - 1, 0)]
+        thread = threading.Thread(target=self._preload,
+                                  args=(pairs, current),
+                                  name='DictionaryPool', daemon=True)
+        thread.start()
+        return thread
+
+    def _preload(self, pairs, current):
+        keep = (current, ) if current is not None else ()
+        # Last first, so the first pair ends up most recently used.
+        for pair in reversed(pairs):
+            if pair in self:
+                continue
+            from_lang, to_lang = pair
+            try:
+                self._get(pair, keep)
+            except (IOError, OSError):
+                logging.exception('Can not preload %s-%s', from_lang,
+                                  to_lang)
+
 
 class EnglishDictionary:
 
-    def __init__(self, database):
-        self._db = dictdlib.DictDB(database)
+    def __init__(self, database, progress=None):
+        """progress, if given, is called with the fraction of the index
+        loaded so far; see dictdlib.DictDB."""
+        self._db = dictdlib.DictDB(database, progress=progress)
 
     def get_definition(self, word):
         return self._db.getdef(word)
 
-    def get_suggestions(self, word):
-        word = word.lower()
-        suggestions = []
-        for key in self._db.getdeflist():
-            if word in key:
-                suggestions.append(key)
-        return suggestions
+    def get_suggestions(self, word, limit=None):
+        return self._db.get_suggestions(word, limit)
+
+    def iter_suggestions(self, word):
+        return self._db.iter_suggestions(word)
 
 # move to test
 
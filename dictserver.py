@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Serve the dictionaries of the activity with the DICT protocol (RFC
+2229), so dict clients (dict, GoldenDict...) on the network can use
+them.
+
+Every dictionary of the directory is a database, named after its
+language pair (eng-spa).  Supported commands: DEFINE, MATCH with the
+exact, prefix and substring strategies, SHOW DB, SHOW STRAT, SHOW
+INFO, CLIENT, STATUS, HELP and QUIT.  Words are matched regardless of
+case.
+
+Connections are handled by an asyncio event loop, so a single process
+takes hundreds of them; the lookups run on a small pool of threads
+sharing one DictDB per dictionary.
+
+Usage: python3 dictserver.py [--host 127.0.0.1] [--port 2628] [-d dictd]"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import shlex
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import dictdlib
+import dictdmodel
+
+DICT_PORT = 2628
+# MATCH answers are cut after this many headwords per database; a
+# substring of one letter matches most of a dictionary.
+_MAX_MATCHES = 1000
+# The longest command line accepted, as RFC 2229 says.
+_MAX_LINE = 1024
+
+_STRATEGIES = [('exact', 'Match headwords exactly'),
+               ('prefix', 'Match prefixes'),
+               ('substring', 'Match substrings')]
+_DEFAULT_STRATEGY = 'prefix'
+
+_HELP = """DEFINE database word         -- look up word in database
+MATCH database strategy word -- match word in database using strategy
+SHOW DB                      -- list all accessible databases
+SHOW STRAT                   -- list available matching strategies
+SHOW INFO database           -- provide information about the database
+CLIENT info                  -- identify client to server
+STATUS                       -- display timing information
+HELP                         -- display this help information
+QUIT                         -- terminate connection"""
+
+
+class CommandError(Exception):
+
+    """An error to answer with a status line."""
+
+
+class Databases:
+
+    """The dictionaries served, opened on first use and shared by the
+    threads of the lookup pool."""
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._catalog = dictdmodel.Dictionaries(directory)
+        self._databases = {}
+        self._lock = threading.Lock()
+        self.names = self._catalog.get_dictionaries_from()
+
+    def description(self, name):
+        from_lang, to_lang = self._catalog.get_info(name)['pair']
+        return '%s-%s' % (dictdmodel.lang_codes.get(from_lang, from_lang),
+                          dictdmodel.lang_codes.get(to_lang, to_lang))
+
+    def get(self, name):
+        with self._lock:
+            database = self._databases.get(name)
+        if database is not None:
+            return database
+        # Open it outside the lock, it can take a while.
+        database = dictdlib.DictDB(
+            os.path.join(self._directory, name), quiet=1, lazy=1)
+        with self._lock:
+            # Someone else may have opened it meanwhile; use theirs.
+            return self._databases.setdefault(name, database)
+
+    def select(self, name):
+        """Returns the names of the databases name stands for: '*' and
+        '!' mean all of them."""
+        if name in ('*', '!'):
+            return self.names
+        if name not in self.names:
+            raise CommandError('550 invalid database, use "SHOW DB" '
+                               'for list of databases')
+        return [name]
+
+    def define(self, name, word):
+        """Returns the definitions of word in database name, as a list
+        of (headword, text)."""
+        database = self.get(name)
+        definitions = []
+        for headword in _variants(word):
+            for text in database.getdef(headword):
+                definitions.append((headword, text))
+        return definitions
+
+    def match(self, name, strategy, word):
+        """Returns the headwords of database name that match word."""
+        database = self.get(name)
+        if strategy == 'exact':
+            return [headword for headword in _variants(word)
+                    if database.hasdef(headword)]
+        word = word.lower()
+        if strategy == 'prefix':
+            def matches(headword):
+                return headword.lower().startswith(word)
+        else:
+            def matches(headword):
+                return word in headword.lower()
+        if len(word) >= 3:
+            headwords = database.getsubstringlist(word, ignorecase=1)
+        elif strategy == 'prefix':
+            # getprefixlist() is case sensitive: try every spelling.
+            headwords = set()
+            for prefix in itertools.product(*[(c, c.upper())
+                                               for c in word]):
+                headwords.update(database.getprefixlist(''.join(prefix)))
+            headwords = sorted(headwords)
+        else:
+            # Too short for the trigram index.
+            headwords = database.getdeflist()
+        return list(itertools.islice(filter(matches, headwords),
+                                     _MAX_MATCHES))
+
+    def info(self, name):
+        return ''.join(self.get(name).getdef(dictdlib.info_headword))
+
+
+def _variants(word):
+    """Returns the spellings of word to look up: getdef() is case
+    sensitive, the suggestions are lower-cased."""
+    variants = []
+    for variant in (word, word.lower(), word.capitalize()):
+        if variant not in variants:
+            variants.append(variant)
+    return variants
+
+
+def _text(text):
+    """Returns text as the lines of a text response, dot-stuffed and
+    terminated by a line with a single dot."""
+    lines = text.rstrip('\n').split('\n')
+    return ''.join(['.' + line + '\r\n' if line.startswith('.')
+                    else line + '\r\n' for line in lines]) + '.\r\n'
+
+
+class Connection:
+
+    def __init__(self, server, reader, writer):
+        self._server = server
+        self._reader = reader
+        self._writer = writer
+        self._client = None
+
+    async def run(self):
+        self._send('220 %s words dictd <> <%d.%d@%s>' %
+                   (self._server.hostname, os.getpid(), id(self),
+                    self._server.hostname))
+        while True:
+            try:
+                line = await self._reader.readuntil(b'\n')
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except asyncio.LimitOverrunError:
+                self._send('500 line too long')
+                break
+            try:
+                words = shlex.split(line.decode('utf-8', 'replace'))
+            except ValueError:
+                self._send('501 syntax error, illegal parameters')
+                continue
+            if not words:
+                continue
+            try:
+                if not await self._command(words):
+                    break
+            except CommandError as error:
+                self._send(str(error))
+            except Exception:
+                logging.exception('%r failed', words)
+                self._send('420 server temporarily unavailable')
+            await self._writer.drain()
+        self._writer.close()
+
+    def _send(self, line):
+        self._writer.write(line.encode('utf-8') + b'\r\n')
+
+    def _lookup(self, function, *args):
+        return asyncio.get_running_loop().run_in_executor(
+            self._server.executor, function, *args)
+
+    async def _command(self, words):
+        """Runs a command; returns false if the connection is over."""
+        command = words[0].upper()
+        args = words[1:]
+        databases = self._server.databases
+        if command == 'DEFINE':
+            if len(args) != 2:
+                raise CommandError('501 syntax error, illegal parameters')
+            await self._define(databases, *args)
+        elif command == 'MATCH':
+            if len(args) != 3:
+                raise CommandError('501 syntax error, illegal parameters')
+            await self._match(databases, *args)
+        elif command == 'SHOW' and args:
+            what = args[0].upper()
+            if what in ('DB', 'DATABASES') and len(args) == 1:
+                self._send('110 %d databases present' % len(databases.names))
+                self._writer.write(_text('\n'.join(
+                    ['%s "%s"' % (name, databases.description(name))
+                     for name in databases.names])).encode('utf-8'))
+                self._send('250 ok')
+            elif what in ('STRAT', 'STRATEGIES') and len(args) == 1:
+                self._send('111 %d strategies present' % len(_STRATEGIES))
+                self._writer.write(_text('\n'.join(
+                    ['%s "%s"' % strategy for strategy in _STRATEGIES]))
+                    .encode('utf-8'))
+                self._send('250 ok')
+            elif what == 'INFO' and len(args) == 2:
+                name = databases.select(args[1])[0]
+                info = await self._lookup(databases.info, name)
+                self._send('112 database information follows')
+                self._writer.write(_text(
+                    info or databases.description(name)).encode('utf-8'))
+                self._send('250 ok')
+            else:
+                raise CommandError('501 syntax error, illegal parameters')
+        elif command == 'CLIENT':
+            self._client = ' '.join(args)
+            self._send('250 ok')
+        elif command == 'STATUS':
+            self._send('210 status: %d connections' %
+                       self._server.connections)
+        elif command == 'HELP':
+            self._send('113 help text follows')
+            self._writer.write(_text(_HELP).encode('utf-8'))
+            self._send('250 ok')
+        elif command == 'QUIT':
+            self._send('221 bye')
+            await self._writer.drain()
+            return False
+        else:
+            raise CommandError('500 syntax error, command not recognized')
+        return True
+
+    async def _define(self, databases, name, word):
+        definitions = []
+        for database in databases.select(name):
+            found = await self._lookup(databases.define, database, word)
+            definitions.extend((database, headword, text)
+                               for headword, text in found)
+            if found and name == '!':
+                break
+        if not definitions:
+            raise CommandError('552 no match')
+        self._send('150 %d definitions retrieved' % len(definitions))
+        for database, headword, text in definitions:
+            self._send('151 "%s" %s "%s"' %
+                       (headword, database, databases.description(database)))
+            self._writer.write(_text(text).encode('utf-8'))
+        self._send('250 ok')
+
+    async def _match(self, databases, name, strategy, word):
+        if strategy == '.':
+            strategy = _DEFAULT_STRATEGY
+        if strategy not in [known for known, description in _STRATEGIES]:
+            raise CommandError('551 invalid strategy, use "SHOW STRAT" '
+                               'for a list of strategies')
+        matches = []
+        for database in databases.select(name):
+            found = await self._lookup(databases.match, database, strategy,
+                                       word)
+            matches.extend((database, headword) for headword in found)
+            if found and name == '!':
+                break
+        if not matches:
+            raise CommandError('552 no match')
+        self._send('152 %d matches found' % len(matches))
+        self._writer.write(_text('\n'.join(
+            ['%s "%s"' % match for match in matches])).encode('utf-8'))
+        self._send('250 ok')
+
+
+class DictServer:
+
+    def __init__(self, directory, threads=8):
+        self.databases = Databases(directory)
+        self.executor = ThreadPoolExecutor(threads,
+                                           thread_name_prefix='dict')
+        self.hostname = socket.gethostname()
+        self.connections = 0
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            await Connection(self, reader, writer).run()
+        finally:
+            self.connections -= 1
+
+    async def start(self, host, port):
+        """Starts listening; returns the asyncio server."""
+        return await asyncio.start_server(self._handle, host, port,
+                                          limit=_MAX_LINE, backlog=1024)
+
+
+async def serve(directory, host, port, threads):
+    server = await DictServer(directory, threads).start(host, port)
+    logging.info('Serving %s on %s', directory,
+                 ', '.join('%s:%d' % sock.getsockname()[:2]
+                           for sock in server.sockets))
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve the dictionaries with the DICT protocol.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DICT_PORT)
+    parser.add_argument('--threads', type=int, default=8,
+                        help='lookups run at once')
+    parser.add_argument('-d', '--directory', default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'dictd'),
+        help='dictionary directory')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else
+                        logging.INFO)
+    try:
+        asyncio.run(serve(args.directory, args.host, args.port,
+                          args.threads))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Runs dictionary lookups off the main loop.
+
+Jobs go to a single worker thread, so they run one at a time.  Every
+job has a kind ('definition', 'suggestions'...) and gets the next
+generation number of its kind when submitted; a job is dropped, before
+it runs or before its result is delivered, as soon as a newer job of
+the same kind exists.  Results are handed to the main loop through a
+dispatch function such as GLib.idle_add, so callbacks can update
+widgets.
+
+FanOutLookup runs the same lookup against several dictionaries at once,
+on a pool of threads.
+
+The language pair handles are not the worker's own: they come from a
+dictdmodel.DictionaryPool, which the preload thread fills in too, and
+FanOutLookup's threads use the same ones.  Each DictDB serializes the
+lookups on it with its own lock, so the jobs themselves need no locking;
+only the English dictionary, once loaded, is used from the worker
+thread alone."""
+
+import collections
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LookupEngine:
+
+    def __init__(self, dispatch):
+        """dispatch(function, *args) must arrange for function(*args) to
+        be called on the main loop, as GLib.idle_add does."""
+        self._dispatch = dispatch
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run,
+                                        name='LookupEngine', daemon=True)
+        self._thread.start()
+
+    def submit(self, kind, callback, function, *args):
+        """Runs function(*args) on the worker thread, then callback(result)
+        on the main loop, unless another job of the same kind has been
+        submitted in the meantime.  Returns the generation of the job."""
+        with self._lock:
+            generation = self._generations.get(kind, 0) + 1
+            self._generations[kind] = generation
+        self._queue.put((kind, generation, callback, function, args))
+        return generation
+
+    def cancel(self, kind=None):
+        """Drops the pending jobs of kind, or of every kind if None."""
+        with self._lock:
+            kinds = list(self._generations) if kind is None else [kind]
+            for kind in kinds:
+                self._generations[kind] = self._generations.get(kind, 0) + 1
+
+    def is_current(self, kind, generation):
+        """Returns true if generation is still the newest job of kind."""
+        with self._lock:
+            return self._generations.get(kind) == generation
+
+    def stop(self):
+        """Finishes the job in progress, drops the others and ends the
+        worker thread."""
+        self.cancel()
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            kind, generation, callback, function, args = job
+            if not self.is_current(kind, generation):
+                continue
+            try:
+                result = function(*args)
+            except Exception:
+                logging.exception('lookup %s%r failed', kind, args)
+                continue
+            if self.is_current(kind, generation):
+                self._dispatch(self._deliver, kind, generation, callback,
+                               result)
+
+    def _deliver(self, kind, generation, callback, result):
+        # On the main loop, where the text may have changed again since
+        # the worker checked.
+        if self.is_current(kind, generation):
+            callback(result)
+        return False
+
+
+class FanOutLookup:
+
+    """Runs a batch of lookups concurrently on a pool of threads and
+    delivers every result on the main loop as soon as it is known, so a
+    view can fill in progressively.  Submitting a batch, or cancelling,
+    drops what is left of the previous one: its pending lookups do not
+    run and the results of the running ones are not delivered."""
+
+    def __init__(self, dispatch, threads=4):
+        """dispatch is as for LookupEngine."""
+        self._dispatch = dispatch
+        self._executor = ThreadPoolExecutor(threads,
+                                            thread_name_prefix='FanOut')
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def submit(self, callback, function, jobs):
+        """Runs function(*args) for every args tuple of jobs, then
+        callback(args, result) on the main loop, result being None if the
+        lookup failed.  Returns the generation of the batch."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        for args in jobs:
+            self._executor.submit(self._run, generation, callback, function,
+                                  args)
+        return generation
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+
+    def is_current(self, generation):
+        with self._lock:
+            return self._generation == generation
+
+    def stop(self):
+        """Drops the pending lookups and lets the threads end."""
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, generation, callback, function, args):
+        if not self.is_current(generation):
+            return
+        try:
+            result = function(*args)
+        except Exception:
+            logging.exception('lookup %r failed', args)
+            result = None
+        if self.is_current(generation):
+            self._dispatch(self._deliver, generation, callback, args, result)
+
+    def _deliver(self, generation, callback, args, result):
+        if self.is_current(generation):
+            callback(args, result)
+        return False
+
+
+class LatencyTracker:
+
+    """Rolling record of how long lookups take, per key (a language pair
+    and a kind of lookup, say).  Only the last window samples of a key
+    are kept, so the percentiles follow the dictionary in use and the
+    state of the disk cache.  Safe to use from several threads."""
+
+    def __init__(self, window=50):
+        self._window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, seconds):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = \
+                    collections.deque(maxlen=self._window)
+            samples.append(seconds)
+
+    def percentile(self, key, fraction, default=None):
+        """Returns the fraction (0.9 for the 90th percentile) percentile
+        of the samples of key, in seconds, or default if there are none."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return default
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+    def timed(self, key, function, *args):
+        """Calls function(*args), adds the time it took to key and
+        returns its result."""
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.add(key, time.perf_counter() - start)
@@ -0,0 +1,147 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Opt-in timing of the stages of a lookup.
+
+Set WORDS_TRACE=1 in the environment to enable it.  The functions
+decorated with traced() then record how long every call takes, in a
+rolling histogram per dictionary (language pair) and stage, which
+dump() writes to the log and, optionally, to a JSON file.  When
+WORDS_TRACE is not set, traced() returns the functions unchanged, so
+the instrumentation costs nothing."""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+enabled = bool(os.environ.get('WORDS_TRACE'))
+
+# The histograms count the samples in buckets growing by powers of two,
+# from up to 1 us to over 2 ** (_BUCKETS - 2) us (about 17 s).
+_BUCKETS = 26
+_WINDOW = 1000
+
+_lock = threading.Lock()
+_histograms = {}
+
+
+class Histogram:
+
+    """Latency histogram of the last window samples."""
+
+    def __init__(self, window=_WINDOW):
+        self.counts = [0] * _BUCKETS
+        self.total = 0
+        self._samples = deque(maxlen=window)
+
+    @staticmethod
+    def bucket(seconds):
+        return min(_BUCKETS - 1, max(0, int(seconds * 1e6) - 1).bit_length())
+
+    def add(self, seconds):
+        if len(self._samples) == self._samples.maxlen:
+            self.counts[self.bucket(self._samples[0])] -= 1
+        self._samples.append(seconds)
+        self.counts[self.bucket(seconds)] += 1
+        self.total += 1
+
+    def percentile(self, fraction):
+        samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+    def summary(self):
+        """Returns a dict with the number of calls ever recorded, the
+        percentiles of the window in ms and its bucket counts, keyed by
+        upper bound in us."""
+        return {'calls': self.total,
+                'window': len(self._samples),
+                'p50_ms': self.percentile(0.5) * 1000,
+                'p90_ms': self.percentile(0.9) * 1000,
+                'p99_ms': self.percentile(0.99) * 1000,
+                'max_ms': max(self._samples) * 1000,
+                'buckets_us': dict((str(2 ** i), count)
+                                   for i, count in enumerate(self.counts)
+                                   if count)}
+
+
+def record(key, stage, seconds):
+    with _lock:
+        histogram = _histograms.get((key, stage))
+        if histogram is None:
+            histogram = _histograms[(key, stage)] = Histogram()
+        histogram.add(seconds)
+
+
+def name_of(path):
+    """Returns the dictionary name ('eng-spa') of one of its files."""
+    return os.path.basename(path).split('.')[0]
+
+
+def traced(stage, key):
+    """Decorator recording the time calls to a function take as stage,
+    under key(*args), args being the arguments of the call."""
+    def decorator(function):
+        if not enabled:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(key(*args), stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def summary():
+    """Returns {key: {stage: histogram summary}}."""
+    with _lock:
+        items = [(key, stage, histogram.summary())
+                 for (key, stage), histogram in _histograms.items()
+                 if histogram.total]
+    result = {}
+    for key, stage, histogram in sorted(items):
+        result.setdefault(key, {})[stage] = histogram
+    return result
+
+
+def dump(filename=None):
+    """Logs the percentiles of every stage and, if filename is given,
+    writes summary() to it as JSON.  Does nothing unless enabled."""
+    if not enabled:
+        return
+    stats = summary()
+    for key, stages in stats.items():
+        for stage, histogram in stages.items():
+            logging.info('%-12s %-22s %6d calls  p50 %8.3f  p90 %8.3f  '
+                         'p99 %8.3f  max %8.3f ms', key, stage,
+                         histogram['calls'], histogram['p50_ms'],
+                         histogram['p90_ms'], histogram['p99_ms'],
+                         histogram['max_ms'])
+    if filename is not None:
+        try:
+            with open(filename, 'w') as output:
+                json.dump(stats, output, indent=1, sort_keys=True)
+        except (IOError, OSError):
+            logging.exception('Can not write %s', filename)
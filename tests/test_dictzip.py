@@ -0,0 +1,94 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Round-trip tests for dictdlib.write_dictzip() and DictzipFile.
+
+Usage: python3 -m unittest discover tests"""
+
+import gzip
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dictdlib  # noqa: E402
+
+
+class DictzipTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'test.dict')
+        self.filename = self.source + '.dz'
+        rng = random.Random(0)
+        words = ['house', 'mouse', 'zebra', 'éclair', 'naïve', '\n']
+        self.data = ' '.join(rng.choice(words)
+                             for i in range(5000)).encode('utf-8')
+        with open(self.source, 'wb') as source:
+            source.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def roundtrip(self, chunklen, processes):
+        dictdlib.write_dictzip(self.source, self.filename, chunklen,
+                               processes=processes)
+        with gzip.open(self.filename) as plain:
+            self.assertEqual(plain.read(), self.data)
+        dictfile = dictdlib.DictzipFile(self.filename, cachesize=2)
+        try:
+            rng = random.Random(1)
+            for i in range(200):
+                start = rng.randrange(len(self.data))
+                size = rng.randrange(3 * chunklen)
+                dictfile.seek(start)
+                self.assertEqual(dictfile.read(size),
+                                 self.data[start:start + size])
+        finally:
+            dictfile.close()
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['test.dict', 'test.dict.dz'])
+
+    def test_roundtrip(self):
+        self.roundtrip(100, 1)
+
+    def test_roundtrip_processes(self):
+        self.roundtrip(333, 2)
+
+    def test_open_dictfile(self):
+        dictdlib.write_dictzip(self.source, self.filename, 100, processes=1)
+        dictfile = dictdlib.open_dictfile(self.filename)
+        try:
+            self.assertIsInstance(dictfile, dictdlib.DictzipFile)
+        finally:
+            dictfile.close()
+
+    def test_failure_leaves_nothing(self):
+        # Incompressible chunks of 65535 bytes deflate to more than that.
+        with open(self.source, 'wb') as source:
+            source.write(random.Random(0).randbytes(70000))
+        with self.assertRaises(ValueError):
+            dictdlib.write_dictzip(self.source, self.filename, 65535,
+                                   processes=1)
+        self.assertEqual(os.listdir(self.directory), ['test.dict'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Regression tests for dictdlib.IndexWriter: spilling to runs, deleting
+entries already spilled and merging the runs in sort -df order.
+
+Usage: python3 -m unittest discover tests"""
+
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dictdlib  # noqa: E402
+
+WORDS = ['house', 'House', 'house-boat', 'houseboat', 'hour', "o'clock",
+         'oclock', 'Zebra', 'zebra', 'apple', 'Apple pie', 'apple-pie',
+         'éclair', '00databaseinfo', '00-database-short', 'a', 'A', 'b.c',
+         'bc', 'naïve', 'naive', 'x y', 'xy']
+
+
+class IndexWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'test.index')
+        rng = random.Random(0)
+        self.entries = [(word, 10 * i, len(word) + i)
+                        for i, word in enumerate(WORDS * 3)]
+        rng.shuffle(self.entries)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def line(self, word, start, size):
+        return '%s\t%s\t%s' % (word, dictdlib.b64_encode(start),
+                               dictdlib.b64_encode(size))
+
+    def runs(self):
+        """Returns the run files spilled next to the index so far."""
+        return [name for name in os.listdir(self.directory)
+                if name.endswith('.run')]
+
+    def written(self):
+        with open(self.filename, encoding='utf-8') as index:
+            return index.read().splitlines()
+
+    def write(self, entries, maxbytes):
+        writer = dictdlib.IndexWriter(self.filename, maxbytes)
+        for entry in entries:
+            writer.add(*entry)
+        return writer
+
+    def test_spill_and_merge(self):
+        writer = self.write(self.entries, 1000)
+        self.assertGreater(len(self.runs()), 1)
+        writer.finish()
+        expected = sorted([self.line(*entry) for entry in self.entries],
+                          key=dictdlib.sortkey)
+        self.assertEqual(self.written(), expected)
+        self.assertEqual(os.listdir(self.directory), ['test.index'])
+
+    def test_matches_sort(self):
+        writer = self.write(self.entries, 1000)
+        writer.finish()
+        try:
+            sort = subprocess.run(
+                ['sort', '-df'], input='\n'.join(self.written()) + '\n',
+                stdout=subprocess.PIPE, universal_newlines=True,
+                env=dict(os.environ, LC_ALL='C'), check=True)
+        except (OSError, subprocess.CalledProcessError):
+            self.skipTest('no sort(1)')
+        self.assertEqual(self.written(), sort.stdout.splitlines())
+
+    def test_delete_after_spill(self):
+        half = len(self.entries) // 2
+        writer = self.write(self.entries[:half], 1000)
+        self.assertTrue(self.runs())
+        word, start, size = self.entries[0]
+        writer.delete(word, start, size)
+        writer.delete('house')
+        # Added after the deletions, so kept.
+        writer.add('house', 1, 2)
+        for entry in self.entries[half:]:
+            writer.add(*entry)
+        writer.finish()
+
+        expected = [entry for entry in self.entries[:half]
+                    if entry[0] != 'house' and entry != (word, start, size)]
+        expected += [('house', 1, 2)] + self.entries[half:]
+        expected = sorted([self.line(*entry) for entry in expected],
+                          key=dictdlib.sortkey)
+        self.assertEqual(self.written(), expected)
+
+    def test_abort(self):
+        writer = self.write(self.entries, 1000)
+        self.assertTrue(self.runs())
+        writer.abort()
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Regression tests for DictDB.iter_suggestions(): the suggestions
+narrowed down from the last query must be those a fresh lookup gives.
+
+Usage: python3 -m unittest discover tests"""
+
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dictdlib  # noqa: E402
+
+WORDS = ['house', 'House', 'houses', 'household', 'housing', 'hose',
+         'horse', 'hour', 'lighthouse', 'greenhouse', 'boathouses',
+         'mouse', 'ouse', 'thousand', 'trousers', 'housf', 'h', 'ho',
+         'hou', 'a house', 'house-boat', 'Ousel']
+
+
+class SuggestionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.basename = os.path.join(self.directory, 'test')
+        db = dictdlib.DictDB(self.basename, 'write', quiet=1)
+        for word in WORDS:
+            db.addentry('definition of %s' % word, [word])
+        db.finish()
+        self.db = dictdlib.DictDB(self.basename, quiet=1)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory)
+
+    def fresh(self, word, substrings=True):
+        """Returns the suggestions for word from a DictDB that has not
+        been asked anything before."""
+        db = dictdlib.DictDB(self.basename, quiet=1)
+        try:
+            return list(db.iter_suggestions(word, substrings))
+        finally:
+            db.close()
+
+    def check(self, words, substrings=True):
+        """Queries words in a row, as typed, each one in full."""
+        for word in words:
+            self.assertEqual(list(self.db.iter_suggestions(word, substrings)),
+                             self.fresh(word, substrings), word)
+
+    def test_extension(self):
+        self.check(['h', 'ho', 'hou', 'hous', 'house', 'houses'])
+
+    def test_containment(self):
+        # The substring group of 'ous' is known when 'hous' is typed.
+        self.check(['ous', 'hous', 'thous', 'ouse', 'house', 'ghthouse'])
+
+    def test_deletion(self):
+        self.check(['houses', 'house', 'hous', 'ho'])
+
+    def test_edit(self):
+        self.check(['house', 'housf', 'horse', 'mouse'])
+
+    def test_partially_consumed(self):
+        # Only the first suggestions of 'ous' are taken, so its substring
+        # group is never looked up.
+        first = list(itertools.islice(self.db.iter_suggestions('ous'), 2))
+        self.assertEqual(first, self.fresh('ous')[:2])
+        self.check(['hous'])
+        list(itertools.islice(self.db.iter_suggestions('ous'), 2))
+        self.check(['ouse'])
+
+    def test_without_substrings(self):
+        self.check(['ous', 'hous', 'house'], substrings=False)
+        self.check(['ous'], substrings=False)
+        self.check(['hous', 'ouse'])
+        self.check(['ous'])
+        self.check(['hous', 'house'], substrings=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,11 +17,16 @@
 """Words Activity: A multi-lingual dictionary with speech synthesis."""
 """Actividad Palabras: Un diccionario multi-lengua con sintesis de habla"""
 
+import time
+# Taken before the other imports, for the startup timing report.
+_IMPORT_START = time.perf_counter()
+
 import gi
 gi.require_version('Gdk', '3.0')
 gi.require_version('Gtk', '3.0')
 gi.require_version('WebKit2', '4.0')
 
+from gi.repository import Gio
 from gi.repository import GLib
 from gi.repository import GObject
 from gi.repository import Gdk
@@ -34,6 +39,8 @@ import logging
 import os
 import re
 import json
+import itertools
+import threading
 
 from gettext import gettext as _
 
@@ -41,6 +48,7 @@ from sugar3.activity import activity
 from sugar3.graphics.icon import Icon
 from sugar3.graphics import iconentry
 from sugar3.graphics.toolbarbox import ToolbarBox
+from sugar3.graphics.toggletoolbutton import ToggleToolButton
 from sugar3.activity.widgets import ActivityToolbarButton
 from sugar3.activity.widgets import StopButton
 from sugar3.graphics import style
@@ -50,11 +58,48 @@ from sugar3.graphics.palette import ToolInvoker
 from sugar3.graphics.alert import ErrorAlert
 
 import dictdmodel
+from lookupengine import FanOutLookup
+from lookupengine import LookupEngine
+from lookupengine import LatencyTracker
+import lookupstats
 from roundbox import RoundBox
 from sugar3.speech import SpeechManager
 
+_IMPORT_END = time.perf_counter()
+
 EMPTY_HTML = '<body bgcolor="#E5E5E5"></body>'
-_AUTOSEARCH_TIMEOUT = 1000
+# The autosearch waits for typing to pause, longer when lookups are
+# slow: twice the 90th percentile of the recent lookups of the language
+# pair, within these bounds (ms).  Suggestions are cheap and follow the
+# typing closely; translations and definitions wait at least as long.
+_SUGGESTIONS_TIMEOUT = (30, 500)
+_DEFINITION_TIMEOUT = (150, 1000)
+_AUTOSEARCH_FACTOR = 2
+# Suggestions are shown a page at a time, a page being more than a
+# screenful; the next one is looked up when the list is scrolled to
+# within _SUGGESTIONS_MARGIN rows of its end.
+_SUGGESTIONS_PAGE = 100
+_SUGGESTIONS_MARGIN = 20
+_CATALOG_REFRESH_TIMEOUT = 500
+# Lookups running at once when translating to all languages.
+_ALL_LANGUAGES_THREADS = 4
+_ENGLISH_DICTIONARY = './dictd-en/hEnglish___advanced_version'
+
+
+# lookupstats keys of the methods of WordsActivity.
+
+def _current_pair(self, *args):
+    return '%s-%s' % (self.origin_lang, self.destination_lang)
+
+
+def _lookup_pair(self, text, origin, destination):
+    return '%s-%s' % (origin, destination)
+
+
+def _english(self, *args):
+    return lookupstats.name_of(_ENGLISH_DICTIONARY)
+
+
 _ESPEAK_TO_NEW_LANG_CODE = {
     'afrikaans': 'af',
     'Farsi': 'fa',
@@ -241,15 +286,23 @@ class WordsActivity(activity.Activity):
 
     def __init__(self, handle):
         """Set up the Words activity."""
+        start = time.perf_counter()
+        self._startup_times = [('imports', _IMPORT_END - _IMPORT_START)]
         activity.Activity.__init__(self, handle)
+        self._startup_times.append(('activity setup',
+                                    time.perf_counter() - start))
 
+        start = time.perf_counter()
         self._dictd_data_dir = './dictd/'
-        self._dictionaries = dictdmodel.Dictionaries(self._dictd_data_dir)
+        self._dictionaries = dictdmodel.Dictionaries(
+            self._dictd_data_dir,
+            cache_file=os.path.join(activity.get_activity_root(), 'data',
+                                    'catalog.json'))
+        self._startup_times.append(('dictionary scan',
+                                    time.perf_counter() - start))
+        self._init_start = time.perf_counter()
 
-        self._origin_languages = self._dictionaries.get_all_languages_origin()
-        self._origin_lang_options = {}
-        for lang in self._origin_languages:
-            self._origin_lang_options[lang] = dictdmodel.lang_codes[lang]
+        self._init_origin_language()
 
         self.max_participants = 1
 
@@ -277,6 +330,9 @@ class WordsActivity(activity.Activity):
         else:
             destination = 'spa'
 
+        self._all_languages = \
+            self.metadata.get('all-languages', '0') == '1'
+
         if 'searches' in self.metadata:
             self._searches = json.loads(self.metadata['searches'])
         else:
@@ -285,22 +341,26 @@ class WordsActivity(activity.Activity):
         # Initial values | Valores iniciales
         self.origin_lang = origin
         self.destination_lang = destination
-        self._dictionary = dictdmodel.Dictionary(self._dictd_data_dir,
-                                                 self.origin_lang,
-                                                 self.destination_lang)
-
-        self._autosearch_timer = None
+        # Nothing is opened until the first lookup needs it.
+        self._pool = dictdmodel.DictionaryPool(self._dictd_data_dir)
+        # The pool's own limit, while _translate_all() raises it.
+        self._max_handles = None
+        self._dictionary = None
+        self._preloaded = False
+
+        self._suggestions_timer = None
+        self._definition_timer = None
+        self._latency = LatencyTracker()
         self._english_dictionary = None
-
-        self._alert = ErrorAlert()
-        self._alert.props.title = _('Wait...')
-        self._alert.props.msg = _('Loading dictionary data')
-        self.add_alert(self._alert)
-        self._alert.connect('response', self._alert_cancel_cb)
-        self._alert.show()
-
-        GLib.idle_add(self._init_english_dictionary)
+        self._engine = LookupEngine(GLib.idle_add)
+        self._fanout = FanOutLookup(GLib.idle_add, _ALL_LANGUAGES_THREADS)
+        self._all_translations = {}
         self._last_word_translated = None
+        # (text, origin, destination) of the last suggestions asked for.
+        self._last_suggested = None
+
+        self._alert = None
+        self._init_english_dictionary()
 
         self._from_button = FilterToolItem('go-down',
                                            origin,
@@ -318,8 +378,25 @@ class WordsActivity(activity.Activity):
                                          self.destination_lang,
                                          self._destination_lang_options)
         self._to_button.connect("changed", self.__to_language_changed_cb)
+
+        # Dictionaries can be added or updated while the activity runs.
+        self._catalog_timer = None
+        self._catalog_monitor = Gio.File.new_for_path(
+            self._dictd_data_dir).monitor_directory(
+                Gio.FileMonitorFlags.NONE, None)
+        self._catalog_monitor.connect('changed', self.__catalog_changed_cb)
         toolbar_box.toolbar.insert(self._to_button, -1)
 
+        self._all_languages_button = ToggleToolButton('view-list')
+        self._all_languages_button.set_tooltip(
+            _('Translate to all languages'))
+        self._all_languages_button.set_active(self._all_languages)
+        self._to_button.set_sensitive(not self._all_languages)
+        self._all_languages_button.connect('toggled',
+                                           self.__all_languages_toggled_cb)
+        toolbar_box.toolbar.insert(self._all_languages_button, -1)
+        self._all_languages_button.show()
+
         separator = Gtk.SeparatorToolItem()
         separator.props.draw = False
         separator.set_expand(True)
@@ -391,7 +468,9 @@ class WordsActivity(activity.Activity):
 
         # The "lang1" treeview box
         self._suggestions_model = Gtk.ListStore(str)
+        self._suggestions_more = None
         suggest_treeview = Gtk.TreeView(self._suggestions_model)
+        self._suggest_treeview = suggest_treeview
         suggest_treeview.modify_font(font)
         suggest_treeview.set_enable_search(False)
 
@@ -407,6 +486,8 @@ class WordsActivity(activity.Activity):
         scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
         scroll.add(suggest_treeview)
         scroll.set_vexpand(True)
+        scroll.get_vadjustment().connect('value-changed',
+                                         self.__suggestions_scrolled_cb)
         lang1_container.attach(scroll, 0, 3, 2, 1)
 
         # This container have the result data
@@ -454,6 +535,30 @@ class WordsActivity(activity.Activity):
         scrolled.add(self.translated)
         scrolled.set_hexpand(True)
         scrolled.set_size_request(-1, style.GRID_CELL_SIZE * 2)
+        # Shown or hidden by _show_all_languages_panel().
+        scrolled.set_no_show_all(True)
+        self.translated.show()
+        self._translated_scrolled = scrolled
+
+        result_container.attach(scrolled, 0, 1, 2, 1)
+
+        # Takes the place of the translation when translating to all
+        # languages: a row per language, filled in as each one answers.
+        self._all_translations_box = Gtk.ListBox()
+        self._all_translations_box.set_selection_mode(
+            Gtk.SelectionMode.NONE)
+        self._all_translations_box.modify_bg(
+            Gtk.StateType.NORMAL, style.COLOR_TEXT_FIELD_GREY.get_gdk_color())
+
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER,
+                            Gtk.PolicyType.AUTOMATIC)
+        scrolled.add(self._all_translations_box)
+        scrolled.set_hexpand(True)
+        scrolled.set_size_request(-1, style.GRID_CELL_SIZE * 4)
+        scrolled.set_no_show_all(True)
+        self._all_translations_box.show()
+        self._all_translations_scrolled = scrolled
 
         result_container.attach(scrolled, 0, 1, 2, 1)
 
@@ -487,25 +592,86 @@ class WordsActivity(activity.Activity):
         result_container.attach(scrolled, 0, 3, 2, 1)
 
         self._big_box.show_all()
+        self._show_all_languages_panel()
         self.set_canvas(self._big_box)
         self.totranslate.grab_focus()
+        self._first_draw_id = self._big_box.connect('draw',
+                                                    self.__first_draw_cb)
         self.show_all()
 
+    def __first_draw_cb(self, widget, cr):
+        self._big_box.disconnect(self._first_draw_id)
+        self._startup_times.append(('widgets to first paint',
+                                    time.perf_counter() - self._init_start))
+        self._startup_times.append(('total to first paint',
+                                    time.perf_counter() - _IMPORT_START))
+        logging.debug('Startup times:\n%s', '\n'.join(
+            ['%24s %8.1f ms' % (stage, elapsed * 1000)
+             for stage, elapsed in self._startup_times]))
+        return False
+
     def write_file(self, file_path):
         ''' Write the project to the Journal. '''
         self.metadata['origin'] = self.origin_lang
         self.metadata['destination'] = self.destination_lang
+        self.metadata['all-languages'] = '1' if self._all_languages else '0'
         self.metadata['searches'] = json.dumps(self._searches)
+        lookupstats.dump(os.path.join(activity.get_activity_root(), 'data',
+                                      'lookupstats.json'))
 
     def _init_english_dictionary(self):
         # the english_dictionary is fixed, if we add more,
         # can generalize the code
-        if os.path.exists('./dictd-en/hEnglish___advanced_version.dict'):
-            self._english_dictionary = dictdmodel.EnglishDictionary(
-                './dictd-en/hEnglish___advanced_version')
+        if not os.path.exists(_ENGLISH_DICTIONARY + '.dict') and \
+                not os.path.exists(_ENGLISH_DICTIONARY + '.dict.dz'):
+            return
+
+        self._alert = ErrorAlert()
+        self._alert.props.title = _('Wait...')
+        self._alert.props.msg = _('Loading dictionary data')
+        self.add_alert(self._alert)
+        self._alert.connect('response', self._alert_cancel_cb)
+        self._alert.show()
+
+        # The index is big; load it without blocking the main loop.
+        thread = threading.Thread(target=self._load_english_dictionary,
+                                  name='EnglishDictionary', daemon=True)
+        thread.start()
+
+    def _load_english_dictionary(self):
+        # Runs on its own thread; the dictionary is handed over to the
+        # main loop once loaded, and only used by the engine after that.
+        start = time.perf_counter()
+        try:
+            dictionary = dictdmodel.EnglishDictionary(
+                _ENGLISH_DICTIONARY,
+                progress=lambda fraction: GLib.idle_add(
+                    self._english_dictionary_progress_cb, fraction))
+        except Exception:
+            # Whatever went wrong, the loading alert must still go away.
+            logging.exception('Can not load the English dictionary')
+            dictionary = None
+        GLib.idle_add(self._english_dictionary_loaded_cb, dictionary,
+                      time.perf_counter() - start)
+
+    def _english_dictionary_progress_cb(self, fraction):
+        if self._alert is not None:
+            self._alert.props.msg = _('Loading dictionary data (%d%%)') % \
+                int(fraction * 100)
+        return False
+
+    def _english_dictionary_loaded_cb(self, dictionary, elapsed):
+        logging.debug('English dictionary loaded in %.1f ms', elapsed * 1000)
+        self._english_dictionary = dictionary
         if self._alert is not None:
             self.remove_alert(self._alert)
             self._alert = None
+        # The word on screen may have been looked up before it was ready.
+        text = self._last_word_translated
+        if dictionary is not None and text and self.origin_lang == 'eng':
+            self._engine.submit('definition', self._show_definition,
+                                self._get_definition, text)
+        return False
 
     def _alert_cancel_cb(self, alert, response_id):
         pass
@@ -517,6 +683,8 @@ class WordsActivity(activity.Activity):
         logging.debug('destination languages %s',
                       self._destination_lang_options)
         self._to_button.set_options(self._destination_lang_options)
+        if self._preloaded:
+            self._preload_dictionaries()
         self._translate()
 
     def __to_language_changed_cb(self, widget, value):
@@ -524,12 +692,71 @@ class WordsActivity(activity.Activity):
         self.destination_lang = value
         self._translate()
 
+    def __all_languages_toggled_cb(self, button):
+        self._all_languages = button.get_active()
+        logging.debug('translate to all languages %s', self._all_languages)
+        self._to_button.set_sensitive(not self._all_languages)
+        if not self._all_languages and self._max_handles is not None:
+            # The extra pairs are dropped as the pool opens the next
+            # ones.
+            self._pool.max_handles = self._max_handles
+            self._max_handles = None
+        self._show_all_languages_panel()
+        self._translate()
+
+    def _show_all_languages_panel(self):
+        self._translated_scrolled.set_visible(not self._all_languages)
+        self._all_translations_scrolled.set_visible(self._all_languages)
+
+    def _preload_dictionaries(self):
+        # Open the pairs the "To" button offers, so picking one is
+        # quick: the most searched first.
+        languages = self._dictionaries.get_languages_from(self.origin_lang)
+        languages = sorted(languages, key=lambda lang: -self._searches.get(
+            '%s-%s' % (self.origin_lang, lang), 0))
+        self._pool.preload([(self.origin_lang, lang) for lang in languages],
+                           (self.origin_lang, self.destination_lang))
+
+    def __catalog_changed_cb(self, monitor, file, other_file, event_type):
+        # A copy raises many events; rescan once things settle down.
+        if self._catalog_timer is not None:
+            GLib.source_remove(self._catalog_timer)
+        self._catalog_timer = GLib.timeout_add(_CATALOG_REFRESH_TIMEOUT,
+                                               self._refresh_catalog_cb)
+
+    def _refresh_catalog_cb(self):
+        self._catalog_timer = None
+        changed = self._dictionaries.refresh()
+        if not changed:
+            return False
+        logging.debug('Dictionaries changed: %s', sorted(changed))
+        for dict_name in changed:
+            from_lang, sep, to_lang = dict_name.partition('-')
+            self._pool.discard(from_lang, to_lang)
+        # Let the engine get the current pair from the pool again.
+        self._dictionary = None
+        self._last_suggested = None
+        self._init_origin_language()
+        self._from_button.set_options(self._origin_lang_options)
+        self._init_destination_language()
+        self._to_button.set_options(self._destination_lang_options)
+        self._translate()
+        return False
+
+    def _init_origin_language(self):
+        self._origin_languages = self._dictionaries.get_all_languages_origin()
+        self._origin_lang_options = {}
+        for lang in self._origin_languages:
+            self._origin_lang_options[lang] = dictdmodel.lang_codes.get(
+                lang, lang)
+
     def _init_destination_language(self):
         destination_languages = self._dictionaries.get_languages_from(
             self.origin_lang)
         self._destination_lang_options = {}
         for lang in destination_languages:
-            self._destination_lang_options[lang] = dictdmodel.lang_codes[lang]
+            self._destination_lang_options[lang] = dictdmodel.lang_codes.get(
+                lang, lang)
 
     def _say(self, text, lang):
         speech_manager = SpeechManager()
@@ -554,11 +781,9 @@ class WordsActivity(activity.Activity):
             value = model.get_value(treeiter, 0)
             treeview.handler_block(self._suggestion_changed_cb_id)
             self.totranslate.handler_block(self._totranslate_changed_id)
-            if self._autosearch_timer:
-                GLib.source_remove(self._autosearch_timer)
-                self._autosearch_timer = None
+            self._remove_autosearch_timers()
             self.totranslate.set_text(value)
-            self._translate(inmediate_suggestions=True)
+            self._translate()
             self.totranslate.handler_unblock(self._totranslate_changed_id)
             treeview.handler_unblock(self._suggestion_changed_cb_id)
 
@@ -610,50 +835,92 @@ class WordsActivity(activity.Activity):
         self._say(clean_text, lang)
 
     def __totranslate_changed_cb(self, totranslate):
-        if self._autosearch_timer:
-            GLib.source_remove(self._autosearch_timer)
-        self._autosearch_timer = GLib.timeout_add(_AUTOSEARCH_TIMEOUT,
-                                                     self._autosearch_timer_cb)
+        self._remove_autosearch_timers()
+        if not totranslate.get_text():
+            self._translate()
+            return
+        suggestions_timeout, definition_timeout = self._autosearch_timeouts()
+        self._suggestions_timer = GLib.timeout_add(
+            suggestions_timeout, self._suggestions_timer_cb)
+        self._definition_timer = GLib.timeout_add(
+            definition_timeout, self._definition_timer_cb)
 
     def __totranslate_activated_cb(self, totranslate):
-        if self._autosearch_timer:
-            GLib.source_remove(self._autosearch_timer)
-            self._autosearch_timer = None
+        self._remove_autosearch_timers()
         self._translate()
 
-    def _autosearch_timer_cb(self):
-        logging.debug('_autosearch_timer_cb')
-        self._autosearch_timer = None
+    def _remove_autosearch_timers(self):
+        if self._suggestions_timer:
+            GLib.source_remove(self._suggestions_timer)
+            self._suggestions_timer = None
+        if self._definition_timer:
+            GLib.source_remove(self._definition_timer)
+            self._definition_timer = None
+
+    def _autosearch_timeouts(self):
+        # Returns the suggestions and definition timeouts, in ms.
+        lang_pair = '%s-%s' % (self.origin_lang, self.destination_lang)
+
+        def timeout(keys, bounds):
+            minimum, maximum = bounds
+            latencies = [self._latency.percentile(key, 0.9) for key in keys]
+            if None in latencies:
+                # Nothing measured yet, be careful.
+                return maximum
+            return int(min(maximum, max(
+                minimum, _AUTOSEARCH_FACTOR * max(latencies) * 1000)))
+
+        suggestions = timeout([(lang_pair, 'suggestions')],
+                              _SUGGESTIONS_TIMEOUT)
+        keys = [(lang_pair, 'translation')]
+        if self.origin_lang == 'eng' and self._english_dictionary is not None:
+            keys.append((_ENGLISH_DICTIONARY, 'definition'))
+        definition = timeout(keys, _DEFINITION_TIMEOUT)
+        logging.debug('autosearch timeouts %s: %d ms, %d ms', lang_pair,
+                      suggestions, definition)
+        return suggestions, max(suggestions, definition)
+
+    def _suggestions_timer_cb(self):
+        self._suggestions_timer = None
+        text = self.totranslate.get_text().lower()
+        if text:
+            self._suggest(text)
+        return False
+
+    def _definition_timer_cb(self):
+        self._definition_timer = None
         self._translate()
         return False
 
-    def _translate(self, inmediate_suggestions=False):
+    @lookupstats.traced('activity translate', _current_pair)
+    def _translate(self):
         text = self.totranslate.get_text().lower()
         if not text:
-            self._suggestions_model.clear()
+            self._engine.cancel()
+            self._fanout.cancel()
+            self._clear_all_translations()
+            self._last_suggested = None
+            self._set_suggestions([], None)
             self.translated.get_buffer().set_text('')
             self._html_definition = ''
             self.dictionary.load_html(EMPTY_HTML, 'file:///')
             return
 
-        # verify if the languagemodel is right
-        if self._dictionary.get_from_lang() != self.origin_lang or \
-                self._dictionary.get_to_lang() != self.destination_lang:
-            self._dictionary = dictdmodel.Dictionary(self._dictd_data_dir,
-                                                     self.origin_lang,
-                                                     self.destination_lang)
-
-        translations = self._dictionary.get_definition(text)
-
-        if translations:
-            self.translated.get_buffer().set_text(''.join(translations))
+        # The lookups run on the engine thread; only the newest result of
+        # each kind comes back, to the _show_* callbacks.  The suggestions
+        # may have been asked for already, when typing paused.
+        if self._last_suggested != (text, self.origin_lang,
+                                    self.destination_lang):
+            self._suggest(text)
+        # Looked up in all languages too, the current pair still is, so
+        # it can be spoken.
+        self._engine.submit('translation', self._show_translation,
+                            self._get_translation, text,
+                            self.origin_lang, self.destination_lang)
+        if self._all_languages:
+            self._translate_all(text)
         else:
-            self.translated.get_buffer().set_text('')
-
-        if inmediate_suggestions:
-            self._get_suggestions(text)
-        else:
-            GLib.idle_add(self._get_suggestions, text)
+            self._fanout.cancel()
 
         # the word can be the same because changed the language pair
         if self._last_word_translated == text:
@@ -668,26 +935,187 @@ class WordsActivity(activity.Activity):
 
         self._last_word_translated = text
 
-        GLib.idle_add(self._get_definition, text)
-
-    def _get_suggestions(self, text):
-        # Ask for completion suggestions
-        self._suggestions_model.clear()
-        for x in self._dictionary.get_suggestions(text):
-            self._suggestions_model.append([x])
-
-    def _get_definition(self, text):
         self._html_definition = ''
         self.dictionary.load_html(EMPTY_HTML, 'file:///')
         if self.origin_lang == 'eng' and self._english_dictionary is not None:
-            definition = self._english_dictionary.get_definition(text)
-            if definition:
-                html = ''.join(definition)
-                # remove HR
-                html = re.sub('<HR>', '', html)
-                # remove links
-                html = re.sub('<A.*?</A>', '', html)
-                # set background color to #E5E5E5
-                html = '<body bgcolor="#E5E5E5">' + html + '</body>'
-                self._html_definition = html
-                self.dictionary.load_html(html, 'file:///')
+            self._engine.submit('definition', self._show_definition,
+                                self._get_definition, text)
+        else:
+            self._engine.cancel('definition')
+
+    def _translate_all(self, text):
+        self._clear_all_translations()
+        jobs = []
+        for dict_name in self._dictionaries.get_dictionaries_from(
+                self.origin_lang):
+            from_lang, sep, to_lang = dict_name.partition('-')
+            self._all_translations[to_lang] = \
+                self._add_translation_row(to_lang)
+            jobs.append((text, from_lang, to_lang))
+        # Keep all of them open, rather than reopening some on every
+        # lookup, until the mode is switched off.
+        if self._max_handles is None:
+            self._max_handles = self._pool.max_handles
+        self._pool.max_handles = max(self._max_handles, len(jobs))
+        self._fanout.submit(self._show_pair_translation,
+                            self._get_pair_translation, jobs)
+
+    def _clear_all_translations(self):
+        for row in self._all_translations_box.get_children():
+            row.destroy()
+        self._all_translations = {}
+
+    def _add_translation_row(self, lang):
+        # Returns the label the translation goes to.
+        name = Gtk.Label()
+        name.set_markup('<b>%s</b>' % GLib.markup_escape_text(
+            dictdmodel.lang_codes.get(lang, lang)))
+        name.set_halign(Gtk.Align.START)
+        translation = Gtk.Label('...')
+        translation.set_halign(Gtk.Align.START)
+        translation.set_xalign(0)
+        translation.set_line_wrap(True)
+        translation.set_selectable(True)
+        row = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        row.set_border_width(style.DEFAULT_PADDING)
+        row.pack_start(name, False, False, 0)
+        row.pack_start(translation, False, False, 0)
+        row.show_all()
+        self._all_translations_box.add(row)
+        return translation
+
+    def _suggest(self, text):
+        if not self._preloaded:
+            # First lookup: now is the time to open the other pairs too.
+            self._preloaded = True
+            self._preload_dictionaries()
+        self._last_suggested = (text, self.origin_lang, self.destination_lang)
+        self._engine.submit('suggestions', self._show_suggestions,
+                            self._get_suggestions, text,
+                            self.origin_lang, self.destination_lang)
+
+    # The _get_* methods run on the engine thread, but for
+    # _get_pair_translation(); the dictionaries can be shared, except for
+    # the iterators of iter_suggestions(), which only the engine uses.
+
+    def _get_dictionary(self, origin, destination):
+        # verify if the languagemodel is right
+        if self._dictionary is None or \
+                self._dictionary.get_from_lang() != origin or \
+                self._dictionary.get_to_lang() != destination:
+            start = time.perf_counter()
+            self._dictionary = self._pool.get(origin, destination)
+            logging.debug('Dictionary %s-%s ready in %.1f ms', origin,
+                          destination, (time.perf_counter() - start) * 1000)
+        return self._dictionary
+
+    # Opening a dictionary is not part of the lookup times the autosearch
+    # timeouts are based on.
+
+    @lookupstats.traced('activity translation', _lookup_pair)
+    def _get_translation(self, text, origin, destination):
+        dictionary = self._get_dictionary(origin, destination)
+        return self._latency.timed(
+            ('%s-%s' % (origin, destination), 'translation'),
+            dictionary.get_definition, text)
+
+    @lookupstats.traced('activity suggestions', _lookup_pair)
+    def _get_suggestions(self, text, origin, destination):
+        # Ask for completion suggestions; returns the first page and, if
+        # there may be more, the iterator of the following ones.
+        dictionary = self._get_dictionary(origin, destination)
+        suggestions = self._latency.timed(
+            ('%s-%s' % (origin, destination), 'suggestions'),
+            dictionary.get_suggestions, text, _SUGGESTIONS_PAGE)
+        more = None
+        if len(suggestions) == _SUGGESTIONS_PAGE:
+            more = itertools.islice(dictionary.iter_suggestions(text),
+                                    _SUGGESTIONS_PAGE, None)
+        return suggestions, more
+
+    # Runs on the threads of the fan-out, which share the pool's handles
+    # instead of the engine's.
+
+    @lookupstats.traced('activity all translations', _lookup_pair)
+    def _get_pair_translation(self, text, origin, destination):
+        dictionary = self._pool.get(origin, destination)
+        return self._latency.timed(
+            ('%s-%s' % (origin, destination), 'translation'),
+            dictionary.get_definition, text)
+
+    def _get_more_suggestions(self, more):
+        return more, list(itertools.islice(more, _SUGGESTIONS_PAGE))
+
+    @lookupstats.traced('activity definition', _english)
+    def _get_definition(self, text):
+        definition = self._latency.timed(
+            (_ENGLISH_DICTIONARY, 'definition'),
+            self._english_dictionary.get_definition, text)
+        if not definition:
+            return None
+        html = ''.join(definition)
+        # remove HR
+        html = re.sub('<HR>', '', html)
+        # remove links
+        html = re.sub('<A.*?</A>', '', html)
+        # set background color to #E5E5E5
+        return '<body bgcolor="#E5E5E5">' + html + '</body>'
+
+    def _show_translation(self, translations):
+        self.translated.get_buffer().set_text(''.join(translations))
+
+    def _show_pair_translation(self, job, translations):
+        text, origin, destination = job
+        label = self._all_translations.get(destination)
+        if label is None:
+            return
+        if translations is None:
+            label.set_text(_('Not available'))
+        elif not translations:
+            label.set_text(_('No translation'))
+        else:
+            label.set_text(''.join(translations).strip())
+
+    def _show_suggestions(self, result):
+        self._set_suggestions(*result)
+
+    @lookupstats.traced('liststore fill', _current_pair)
+    def _set_suggestions(self, suggestions, more):
+        # Filling a model attached to the treeview makes it handle every
+        # row as it is inserted; fill a new one and swap it in instead.
+        model = Gtk.ListStore(str)
+        for x in suggestions:
+            model.append([x])
+        self._suggestions_model = model
+        self._suggestions_more = more
+        self._engine.cancel('more-suggestions')
+        self._suggest_treeview.set_model(model)
+
+    def __suggestions_scrolled_cb(self, adjustment):
+        if self._suggestions_more is None:
+            return
+        row_height = adjustment.get_upper() / max(
+            1, len(self._suggestions_model))
+        remaining = adjustment.get_upper() - adjustment.get_value() - \
+            adjustment.get_page_size()
+        if remaining < _SUGGESTIONS_MARGIN * row_height:
+            # Replacing the suggestions cancels the job, so the rows it
+            # returns always belong to the current model.
+            more, self._suggestions_more = self._suggestions_more, None
+            self._engine.submit('more-suggestions',
+                                self._show_more_suggestions,
+                                self._get_more_suggestions, more)
+
+    @lookupstats.traced('liststore more', _current_pair)
+    def _show_more_suggestions(self, result):
+        more, suggestions = result
+        for x in suggestions:
+            self._suggestions_model.append([x])
+        if len(suggestions) == _SUGGESTIONS_PAGE:
+            self._suggestions_more = more
+
+    @lookupstats.traced('webkit load_html', _english)
+    def _show_definition(self, html):
+        if html:
+            self._html_definition = html
+            self.dictionary.load_html(html, 'file:///')
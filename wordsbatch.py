@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Translate word lists with the dictionaries of the activity, without
+the activity.
+
+Reads words, one per line, from the files given or from stdin, and
+writes a JSON object per word and language pair to stdout.  Words go
+in batches of 500, and the results of a batch are written, pair after
+pair, as soon as they are known:
+
+  {"word": "house", "pair": "eng-spa", "definitions": ["..."]}
+
+Words with no definition get "suggestions" too, as the activity would
+show them.  The batches are translated by a pool of worker processes,
+each of which opens a dictionary the first time it needs it and keeps
+it open for the following batches.
+
+Usage:
+  python3 wordsbatch.py -p eng-spa -p eng-deu words.txt
+  python3 wordsbatch.py --from eng -j 4 < words.txt > words.jsonl"""
+
+import argparse
+import collections
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+
+import dictdmodel
+
+_BATCH = 500
+
+# The dictionaries opened by this (worker) process, by pair.
+_dictionaries = {}
+_directory = None
+
+
+def _init_worker(directory):
+    global _directory
+    _directory = directory
+
+
+def _get_dictionary(pair):
+    dictionary = _dictionaries.get(pair)
+    if dictionary is None:
+        from_lang, to_lang = pair.split('-')
+        # Quiet: stdout is for the results.
+        dictionary = dictdmodel.Dictionary(_directory, from_lang, to_lang,
+                                           quiet=1)
+        _dictionaries[pair] = dictionary
+    return dictionary
+
+
+def translate(pair, words, suggestions):
+    """Returns the JSON lines of words in pair."""
+    dictionary = _get_dictionary(pair)
+    lines = []
+    for word in words:
+        result = {'word': word, 'pair': pair,
+                  'definitions': dictionary.get_definition(word)}
+        if not result['definitions'] and suggestions:
+            result['suggestions'] = dictionary.get_suggestions(
+                word.lower(), suggestions)
+        lines.append(json.dumps(result, ensure_ascii=False))
+    return lines
+
+
+def read_words(files):
+    for file_name in files or ['-']:
+        if file_name == '-':
+            stream = sys.stdin
+        else:
+            stream = open(file_name, encoding='utf-8')
+        try:
+            for line in stream:
+                word = line.strip()
+                if word:
+                    yield word
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def batches(words, size):
+    words = iter(words)
+    while True:
+        batch = list(itertools.islice(words, size))
+        if not batch:
+            return
+        yield batch
+
+
+def run(pairs, words, directory, jobs, suggestions, output):
+    tasks = ((pair, batch, suggestions)
+             for batch in batches(words, _BATCH) for pair in pairs)
+    if jobs == 1:
+        _init_worker(directory)
+        for task in tasks:
+            for line in translate(*task):
+                output.write(line + '\n')
+        return
+    with multiprocessing.Pool(jobs, _init_worker, (directory,)) as pool:
+        # Keep a few batches per worker in flight, not the whole input,
+        # and write the results in order as they come.
+        pending = collections.deque()
+        for task in tasks:
+            pending.append(pool.apply_async(translate, task))
+            if len(pending) >= 2 * jobs:
+                for line in pending.popleft().get():
+                    output.write(line + '\n')
+        while pending:
+            for line in pending.popleft().get():
+                output.write(line + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Translate word lists, writing JSON lines.')
+    parser.add_argument('files', nargs='*',
+                        help='files with a word per line (stdin if none)')
+    parser.add_argument('-p', '--pair', action='append', default=[],
+                        help='language pair, as eng-spa; may be repeated')
+    parser.add_argument('--from', dest='from_lang',
+                        help='use every pair from this language')
+    parser.add_argument('-d', '--directory', default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'dictd'),
+        help='dictionary directory')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('-s', '--suggestions', type=int, default=10,
+                        help='suggestions for words not found (0: none)')
+    args = parser.parse_args()
+
+    dictionaries = dictdmodel.Dictionaries(args.directory)
+    available = dictionaries.get_dictionaries_from()
+    pairs = list(args.pair)
+    if args.from_lang:
+        pairs += dictionaries.get_dictionaries_from(args.from_lang)
+    if not pairs:
+        parser.error('no language pair given (use -p or --from)')
+    missing = [pair for pair in pairs if pair not in available]
+    if missing:
+        parser.error('no dictionary for %s' % ', '.join(missing))
+
+    run(pairs, read_words(args.files), args.directory, max(1, args.jobs),
+        args.suggestions, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
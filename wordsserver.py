@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Serve the dictionaries of the activity over HTTP, as JSON, so one
+machine (a school server) can answer the lookups of many others.
+
+  GET /catalog
+      {"dictionaries": {"eng-spa": {"pair": ["eng", "spa"],
+                        "headwords": ..., ...}, ...}}
+  GET /define?pair=eng-spa&word=house
+      {"pair": "eng-spa", "word": "house", "definitions": ["..."]}
+  GET /suggest?pair=eng-spa&word=hou[&limit=20]
+      {"pair": "eng-spa", "word": "hou", "suggestions": ["..."]}
+
+Errors are answered with a 4xx status and {"error": "..."}.
+
+Connections are kept alive (HTTP/1.1) and served by a fixed number of
+threads; when all of them are busy, new connections wait in the listen
+backlog.  The threads share one DictionaryPool, so every dictionary is
+opened once, and look the pairs up in a Dictionaries catalog, which is
+refreshed every few seconds to notice new or updated dictionaries.
+
+Usage: python3 wordsserver.py [--host 127.0.0.1] [--port 8080]
+                              [--threads 8] [-d dictd]"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+import dictdmodel
+
+_SUGGESTIONS_LIMIT = 20
+_MAX_SUGGESTIONS_LIMIT = 1000
+# Seconds between rescans of the dictionary directory.
+_CATALOG_REFRESH = 5
+# Seconds an idle kept-alive connection holds on to its thread.
+_IDLE_TIMEOUT = 10
+
+
+class RequestError(Exception):
+
+    """An error to answer with status."""
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class SharedDictionaries:
+
+    """The catalog and the open dictionaries, shared by the threads."""
+
+    def __init__(self, directory, max_handles):
+        self._catalog = dictdmodel.Dictionaries(directory)
+        self._pool = dictdmodel.DictionaryPool(directory, max_handles,
+                                               quiet=1)
+        self._lock = threading.Lock()
+        self._refreshed = time.monotonic()
+
+    def _refresh(self):
+        with self._lock:
+            if time.monotonic() - self._refreshed < _CATALOG_REFRESH:
+                return
+            self._refreshed = time.monotonic()
+            for name in self._catalog.refresh():
+                logging.info('Dictionary %s changed', name)
+                self._pool.discard(*name.split('-', 1))
+
+    def catalog(self):
+        self._refresh()
+        with self._lock:
+            return dict((name, self._catalog.get_info(name))
+                        for name in self._catalog.get_dictionaries_from())
+
+    def get(self, pair):
+        self._refresh()
+        with self._lock:
+            known = self._catalog.get_info(pair) is not None
+        if not known:
+            raise RequestError(404, 'no dictionary %s' % pair)
+        return self._pool.get(*pair.split('-', 1))
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    timeout = _IDLE_TIMEOUT
+    # The headers and the body are written separately; with Nagle, the
+    # body waits for the client's delayed ACK, some 40 ms per request.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = dict((name, values[-1]) for name, values in
+                     parse_qs(url.query).items())
+        handler = {'/catalog': self._catalog,
+                   '/define': self._define,
+                   '/suggest': self._suggest}.get(url.path)
+        try:
+            if handler is None:
+                raise RequestError(404, 'no such endpoint %s' % url.path)
+            self._send(200, handler(query))
+        except RequestError as error:
+            self._send(error.status, {'error': str(error)})
+        except Exception:
+            logging.exception('%s failed', self.path)
+            self._send(500, {'error': 'internal error'})
+
+    def _send(self, status, result):
+        body = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def _argument(query, name):
+        if not query.get(name):
+            raise RequestError(400, 'missing %s' % name)
+        return query[name]
+
+    def _catalog(self, query):
+        return {'dictionaries': self.server.dictionaries.catalog()}
+
+    def _define(self, query):
+        pair = self._argument(query, 'pair')
+        word = self._argument(query, 'word')
+        dictionary = self.server.dictionaries.get(pair)
+        return {'pair': pair, 'word': word,
+                'definitions': dictionary.get_definition(word)}
+
+    def _suggest(self, query):
+        pair = self._argument(query, 'pair')
+        word = self._argument(query, 'word')
+        try:
+            limit = int(query.get('limit', _SUGGESTIONS_LIMIT))
+        except ValueError:
+            raise RequestError(400, 'bad limit')
+        limit = max(1, min(limit, _MAX_SUGGESTIONS_LIMIT))
+        dictionary = self.server.dictionaries.get(pair)
+        return {'pair': pair, 'word': word,
+                'suggestions': dictionary.get_suggestions(word.lower(),
+                                                          limit)}
+
+    def log_message(self, format, *args):
+        logging.debug('%s %s', self.address_string(), format % args)
+
+
+class LookupServer(HTTPServer):
+
+    """HTTPServer handing each connection to a thread of a pool of
+    threads.  The accept loop blocks while they are all busy."""
+
+    def __init__(self, address, dictionaries, threads):
+        HTTPServer.__init__(self, address, RequestHandler)
+        self.dictionaries = dictionaries
+        self._executor = ThreadPoolExecutor(threads,
+                                            thread_name_prefix='lookup')
+        self._slots = threading.BoundedSemaphore(threads)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            self._executor.submit(self._process, request, client_address)
+        except RuntimeError:
+            # Shutting down.
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        self._executor.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve dictionary lookups over HTTP, as JSON.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--threads', type=int, default=8,
+                        help='connections served at once')
+    parser.add_argument('--max-handles', type=int, default=16,
+                        help='dictionaries kept open')
+    parser.add_argument('-d', '--directory', default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'dictd'),
+        help='dictionary directory')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else
+                        logging.INFO)
+
+    server = LookupServer((args.host, args.port),
+                          SharedDictionaries(args.directory, args.max_handles),
+                          args.threads)
+    logging.info('Serving %s on http://%s:%d/', args.directory,
+                 *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()